@@ -2,12 +2,30 @@ from __future__ import annotations
 
 __all__ = ["relative2gomi"]
 
+import json
 import importlib.util
 import importlib.machinery
 from pathlib import Path
 
 _USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:124.0) Gecko/20100101 Firefox/124.0"
 
+# the machine-specific values measured by `benchmark.tuneIOSize`
+_TUNING_PATH = Path.home() / ".config" / "gomi" / "tuning.json"
+
+
+def _loadTuning() -> dict:
+    try:
+        tuning = json.loads(_TUNING_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return tuning if isinstance(tuning, dict) else {}
+
+
+def _saveTuning(**kwargs):
+    tuning = _loadTuning() | kwargs
+    _TUNING_PATH.parent.mkdir(parents=True, exist_ok=True)
+    _TUNING_PATH.write_text(json.dumps(tuning, indent=2), encoding="utf-8")
+
 
 def relative2gomi(path: Path) -> str:
     return Path(path).relative_to(importlib.util.find_spec("gomi").origin).with_suffix("").as_posix()
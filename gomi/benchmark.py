@@ -0,0 +1,236 @@
+"""This module provides micro benchmarks for the IO-heavy helpers in gomi."""
+
+from __future__ import annotations
+
+__all__ = [
+    "mkDummyTree",
+    "mkDummyFile",
+    "mkDummyTorrent",
+    "benchListFile",
+    "benchFileHashing",
+    "benchHashing",
+    "tuneIOSize",
+    "benchBdecode",
+]
+
+import sys  # fmt: skip
+if sys.version_info < (3, 10):
+    raise RuntimeError("This module requires Python 3.10.")
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional, Sequence
+
+from .__conf import _saveTuning
+from .__utils import PathObj
+from .fs import listFile
+from .file import getFileHashes, getFileCRC32, getFileSHA1
+from .hashing import toCRC32, toSHA1
+from .bencoding import bdecode, bencode
+
+
+def mkDummyTree(root: PathObj, n_files: int = 1_000_000, files_per_dir: int = 100, dirs_per_dir: int = 10) -> Path:
+    """
+    Create a synthetic tree of `n_files` empty files under `root`, reusing `root` if it already exists.
+    Each dir holds `files_per_dir` files and up to `dirs_per_dir` subdirs, filled breadth-first.
+    """
+    root = Path(root)
+    if root.is_dir():
+        return root
+    queue, made = [root], 0
+    while made < n_files:
+        cur = queue.pop(0)
+        cur.mkdir(parents=True, exist_ok=True)
+        for i in range(min(files_per_dir, n_files - made)):
+            cur.joinpath(f"{i:04d}.mkv" if i % 2 else f"{i:04d}.ass").touch()
+        made += min(files_per_dir, n_files - made)
+        queue += [cur / f"d{i:02d}" for i in range(dirs_per_dir)]
+    return root
+
+
+def mkDummyFile(path: PathObj, size: int, chunk_size: int = 2**20) -> Path:
+    "Create a file of `size` random bytes, reusing it if it already exists with the same size."
+    path = Path(path)
+    if path.is_file() and path.stat().st_size == size:
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("wb") as fo:
+        for i in range(0, size, chunk_size):
+            fo.write(os.urandom(min(chunk_size, size - i)))
+    return path
+
+
+def benchListFile(root: PathObj, workers: Sequence[int] = (0, 4, 8, 16, 32), repeat: int = 3) -> dict[int, float]:
+    """
+    Time `listFile(root)` with the serial walk (workers=0) and each given thread pool size.
+    Also checks that every parallel result is identical to the serial one.
+
+    return:dict[int, float]: the best wall time in seconds of each `workers` value
+
+    NOTE drop the OS page/dentry cache between runs to measure the cold (NAS/HDD) case
+    """
+    ret: dict[int, float] = {}
+    expected = None
+    for n in workers:
+        best = float("inf")
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            files = listFile(root, workers=n)
+            best = min(best, time.perf_counter() - start)
+        if expected is None:
+            expected = files
+        elif files != expected:
+            raise RuntimeError(f"listFile(workers={n}) returned a different result from the serial walk.")
+        ret[n] = best
+        print(f"listFile workers={n:>3d}: {best:.3f}s for {len(files)} files")
+    return ret
+
+
+def benchFileHashing(
+    path: PathObj,
+    algos: Sequence[str] = ("crc32", "sha1"),
+    read_sizes: Sequence[int] = (2**16, 2**20, 4 * 2**20, 16 * 2**20, 64 * 2**20),
+    modes: Sequence[str] = ("read", "readinto", "mmap"),
+    repeat: int = 3,
+) -> dict[tuple[str, int], float]:
+    """
+    Measure the throughput of `getFileHashes(path, algos)` for each read mode and read size.
+    The first round warms the page cache, so this measures the CPU/allocation overhead rather than the disk.
+
+    return:dict[tuple[str, int], float]: the best throughput in MB/s of each (mode, read_size)
+    """
+    size = Path(path).stat().st_size
+    getFileHashes(path, algos)
+    ret: dict[tuple[str, int], float] = {}
+    for read_size in read_sizes:
+        for mode in modes:
+            best = float("inf")
+            for _ in range(max(repeat, 1)):
+                start = time.perf_counter()
+                getFileHashes(path, algos, read_size=read_size, mode=mode)
+                best = min(best, time.perf_counter() - start)
+            ret[(mode, read_size)] = size / best / 1e6
+            print(f"{'+'.join(algos)} {mode:>8s} read_size={read_size:>10d}: {ret[(mode, read_size)]:8.1f} MB/s")
+    return ret
+
+
+_FILE_SIZES = (2**20, 64 * 2**20, 512 * 2**20)
+_READ_SIZES = (2**16, 2**20, 4 * 2**20, 16 * 2**20, 64 * 2**20)
+_WORKERS = (1, 2, 4, 8)
+
+
+def _timeConcurrent(func: Callable, args: list, workers: int, repeat: int) -> float:
+    "The best wall time in seconds of running `func` over `args` in a pool of `workers` threads."
+    best = float("inf")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            list(pool.map(func, args))
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchHashing(
+    root: PathObj,
+    file_sizes: Sequence[int] = _FILE_SIZES,
+    read_sizes: Sequence[int] = _READ_SIZES,
+    workers: Sequence[int] = _WORKERS,
+    repeat: int = 3,
+) -> dict[tuple[str, int, Optional[int], int], float]:
+    """
+    Measure the throughput of `getFileCRC32`, `getFileSHA1`, `toCRC32` and `toSHA1`.
+    For each file size, `max(workers)` synthetic files are created under `root` (reused on later runs)
+    and each `workers` value hashes that many of them at once in a thread pool, over each read size.
+    `toCRC32`/`toSHA1` hash in-memory bytes of the same sizes, capped at 64 MiB, so they have no read size.
+    The files are read once before timing, so this measures the page cache rather than the disk.
+
+    return:dict[tuple[str, int, Optional[int], int], float]:
+    the best aggregate throughput in MB/s of each (function name, file size, read size, workers)
+    """
+    ret: dict[tuple[str, int, Optional[int], int], float] = {}
+    n_files = max(workers)
+
+    def record(name: str, size: int, read_size: Optional[int], n: int, seconds: float):
+        ret[(name, size, read_size, n)] = n * size / seconds / 1e6
+        print(f"{name:>12s} size={size:>10d} read_size={read_size or '-':>10} workers={n:>2d}: "
+              f"{ret[(name, size, read_size, n)]:8.1f} MB/s")
+
+    for size in file_sizes:
+        paths = [mkDummyFile(Path(root) / f"{size}_{i}.bin", size) for i in range(n_files)]
+        for path in paths:
+            getFileHashes(path, ("crc32",))
+        for func in (getFileCRC32, getFileSHA1):
+            for read_size in read_sizes:
+                for n in workers:
+                    seconds = _timeConcurrent(lambda p: func(p, read_size=read_size), paths[:n], n, repeat)
+                    record(func.__name__, size, read_size, n, seconds)
+
+        data = [os.urandom(min(size, 64 * 2**20))] * n_files
+        for func in (toCRC32, toSHA1):
+            for n in workers:
+                record(func.__name__, len(data[0]), None, n, _timeConcurrent(func, data[:n], n, repeat))
+    return ret
+
+
+def tuneIOSize(
+    root: PathObj,
+    file_size: int = 256 * 2**20,
+    read_sizes: Sequence[int] = _READ_SIZES,
+    tolerance: float = 0.05,
+    repeat: int = 3,
+    store: bool = True,
+) -> int:
+    """
+    Pick the read size giving the best `getFileCRC32` + `getFileSHA1` throughput on this machine.
+    The smallest read size within `tolerance` of the best is chosen, as a larger one only costs more memory.
+
+    root: PathObj: the dir to create the synthetic file in, better on the disk to be hashed
+    store: bool: save the choice, which becomes the default `read_size` of `gomi.file` from the next import
+
+    return:int: the chosen read size in bytes
+    """
+    path = mkDummyFile(Path(root) / f"{file_size}_tune.bin", file_size)
+    getFileHashes(path, ("crc32",))
+    seconds: dict[int, float] = {}
+    for read_size in read_sizes:
+        seconds[read_size] = sum(
+            _timeConcurrent(lambda p: func(p, read_size=read_size), [path], 1, repeat)
+            for func in (getFileCRC32, getFileSHA1)
+        )
+        print(f"read_size={read_size:>10d}: {2 * file_size / seconds[read_size] / 1e6:8.1f} MB/s")
+    best = min(seconds.values())
+    io_size = min(read_size for read_size, t in seconds.items() if t <= best * (1 + tolerance))
+    if store:
+        _saveTuning(io_size=io_size)
+    return io_size
+
+
+def mkDummyTorrent(n_files: int, piece_length: int = 2**18) -> bytes:
+    "Bencode a multi-file torrent of `n_files` files with a fake piece per file."
+    files = [{"length": piece_length, "path": [f"d{i % 100:02d}", f"{i:08d}.mkv"]} for i in range(n_files)]
+    info = {"files": files, "name": "dummy", "piece length": piece_length, "pieces": os.urandom(20 * n_files)}
+    return bencode({"announce": "http://localhost/announce", "info": info})
+
+
+def benchBdecode(
+    n_files: Sequence[int] = (1_000, 10_000, 100_000), paths: Sequence[PathObj] = (), repeat: int = 3
+) -> dict[str, float]:
+    """
+    Time `bdecode` on synthetic torrents of `n_files` files and on the given .torrent files.
+    A linear decoder keeps the MB/s about constant as the torrents grow.
+
+    return:dict[str, float]: the best throughput in MB/s of each torrent, keyed by its file count or path
+    """
+    inputs = {f"{n}_files": mkDummyTorrent(n) for n in n_files} | {str(p): Path(p).read_bytes() for p in paths}
+    ret: dict[str, float] = {}
+    for name, data in inputs.items():
+        best = float("inf")
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            bdecode(data)
+            best = min(best, time.perf_counter() - start)
+        ret[name] = len(data) / best / 1e6
+        print(f"bdecode {name}: {len(data) / 1e6:8.2f} MB in {best:.3f}s, {ret[name]:6.1f} MB/s")
+    return ret
@@ -2,63 +2,274 @@
 
 from __future__ import annotations
 
-__all__ = ["bencode", "bdecode"]
+__all__ = ["bencode", "bencodeTo", "bdecode", "bdecodeLazy", "LazyDict", "LazyList"]
 
 import sys  # fmt: skip
 if sys.version_info < (3, 10):
     raise RuntimeError("This module requires Python 3.10.")
 
-import re
-from functools import partial
+import mmap
+from pathlib import Path
+from collections.abc import Mapping, Sequence
+from typing import BinaryIO, Iterator, Optional, Union
+
+from .__utils import PathObj
 
 
-_INT_REGEX = re.compile(rb"i(-?\d+)e(.*)", re.DOTALL)
-_BYTES_REGEX = re.compile(rb"(\d+):(.*)", re.DOTALL)
-_LIST_REGEX = re.compile(rb"l(.+)", re.DOTALL)
-_DICT_REGEX = re.compile(rb"d(.+)", re.DOTALL)
 _ENCODING = "utf-8"
+_INT, _LIST, _DICT, _END = b"ilde"
+
+
+def _parseInt(token: bytes) -> int:
+    if not (token[1:] if token[:1] == b"-" else token).isdigit():  #! isdigit of bytes only accepts ascii digits
+        raise ValueError(f'Bdecode hits malformed integer "{token}".')
+    return int(token)
 
 
-def _bdecode(bchars: bytes) -> tuple[dict | list | bytes | int, bytes]:
-    if m := _INT_REGEX.match(bchars):
-        return int(m.group(1)), m.group(2)
-    elif m := _BYTES_REGEX.match(bchars):
-        len = int(m.group(1))
-        rest = m.group(2)
-        return rest[:len], rest[len:]
-    elif m := _LIST_REGEX.match(bchars):
+def _bdecode(buf: bytes | bytearray | mmap.mmap, pos: int) -> tuple[dict | list | bytes | int, int]:
+    "Decode the value starting at `pos` of the buffer, return it with the offset right after it."
+    c = buf[pos]  #! IndexError on truncated content
+    if c == _INT:
+        if (end := buf.find(b"e", pos + 1)) < 0:
+            raise IndexError
+        return _parseInt(buf[pos + 1 : end]), end + 1
+    elif c == _LIST:
         l: list = []
-        payload = m.group(1)
-        while payload:
-            if payload.startswith(b"e"):  #! must be placed before further decode to handle empty list
-                return l, payload[1:]
-            elem, payload = _bdecode(payload)
+        pos += 1
+        while buf[pos] != _END:
+            elem, pos = _bdecode(buf, pos)
             l.append(elem)
-        return l, b""
-    elif m := _DICT_REGEX.match(bchars):
+        return l, pos + 1
+    elif c == _DICT:
         d: dict = {}
-        payload = m.group(1)
-        while payload:
-            if payload.startswith(b"e"):  #! must be placed before further decode to handle empty dict
-                return d, payload[1:]
-            key, payload = _bdecode(payload)
-            val, payload = _bdecode(payload)
-            d[key] = val
-        return d, b""
+        pos += 1
+        while buf[pos] != _END:
+            key, pos = _bdecode(buf, pos)
+            d[key], pos = _bdecode(buf, pos)
+        return d, pos + 1
+    elif 0x30 <= c <= 0x39:  # 0-9
+        if (colon := buf.find(b":", pos)) < 0:
+            raise IndexError
+        start = colon + 1
+        end = start + _parseInt(buf[pos:colon])
+        if end > len(buf):
+            raise IndexError
+        return bytes(buf[start:end]), end
     else:
-        raise ValueError(f'Bdecode hits malformed content "{bchars}".')
+        raise ValueError(f"Bdecode hits malformed content at offset {pos}.")
 
 
-def bdecode(bchars: bytes) -> dict | list | bytes | int:
-
-    if not isinstance(bchars, bytes):
+def bdecode(bchars: bytes | bytearray | memoryview | mmap.mmap) -> dict | list | bytes | int:
+    """
+    Decode a bencoded buffer in a single pass.
+    The parser walks the buffer by offsets, so only the decoded values are copied out of it.
+    """
+    if isinstance(bchars, memoryview):
+        bchars = bchars.tobytes()
+    if not isinstance(bchars, bytes | bytearray | mmap.mmap):
         raise TypeError(f"Bdecode expects bytes, not {type(bchars)}.")
-    ret, rest = _bdecode(bchars)
-    if rest:
+    try:
+        ret, end = _bdecode(bchars, 0)
+    except IndexError:
+        raise ValueError("Bdecode hits truncated content.") from None
+    except RecursionError:
+        raise ValueError("Bdecode hits too deeply nested content.") from None
+    if end != len(bchars):
         raise ValueError("Bdecode hits trailing content.")
     return ret
 
 
+def _skip(buf: bytes | bytearray | mmap.mmap, pos: int) -> int:
+    "Return the offset right after the value starting at `pos`, without building it or reading the strings."
+    depth = 0
+    while True:
+        c = buf[pos]
+        if c == _INT:
+            if (end := buf.find(b"e", pos + 1)) < 0:
+                raise IndexError
+            _parseInt(buf[pos + 1 : end])
+            pos = end + 1
+        elif c == _LIST or c == _DICT:
+            depth += 1
+            pos += 1
+            continue
+        elif c == _END and depth:
+            depth -= 1
+            pos += 1
+        elif 0x30 <= c <= 0x39:  # 0-9
+            if (colon := buf.find(b":", pos)) < 0:
+                raise IndexError
+            pos = colon + 1 + _parseInt(buf[pos:colon])
+            if pos > len(buf):
+                raise IndexError
+        else:
+            raise ValueError(f"Bdecode hits malformed content at offset {pos}.")
+        if not depth:
+            return pos
+
+
+def _lazy(buf: bytes | bytearray | mmap.mmap, pos: int) -> LazyDict | LazyList | bytes | int:
+    c = buf[pos]
+    if c == _DICT:
+        return LazyDict(buf, pos)
+    if c == _LIST:
+        return LazyList(buf, pos)
+    return _bdecode(buf, pos)[0]
+
+
+class LazyDict(Mapping):
+    """
+    A read-only bencoded dict decoded on demand from its buffer.
+    The keys and the offsets of their values are indexed on the first access, skipping over the values.
+    A value is decoded on each access, as a nested `LazyDict`/`LazyList` for containers.
+    The keys are bytes as in `bdecode`, but str keys are also accepted in lookups.
+    """
+
+    __slots__ = ("__buf", "__start", "__end", "__offsets")
+
+    def __init__(self, buf: bytes | bytearray | mmap.mmap, start: int):
+        self.__buf = buf
+        self.__start = start
+        self.__end = -1
+        self.__offsets: dict | None = None
+
+    def __index(self) -> dict:
+        if self.__offsets is None:
+            offsets = {}
+            buf, pos = self.__buf, self.__start + 1
+            try:
+                while buf[pos] != _END:
+                    key, pos = _bdecode(buf, pos)
+                    offsets[key] = pos
+                    pos = _skip(buf, pos)
+            except IndexError:
+                raise ValueError("Bdecode hits truncated content.") from None
+            except RecursionError:
+                raise ValueError("Bdecode hits too deeply nested content.") from None
+            self.__offsets, self.__end = offsets, pos + 1
+        return self.__offsets
+
+    def __getitem__(self, key: bytes | str) -> LazyDict | LazyList | bytes | int:
+        offset = self.__index()[key.encode(_ENCODING) if isinstance(key, str) else key]
+        return _lazy(self.__buf, offset)
+
+    def __contains__(self, key) -> bool:
+        #! not the `Mapping` one, which decodes the value by `__getitem__` (e.g. the whole `pieces`)
+        return (key.encode(_ENCODING) if isinstance(key, str) else key) in self.__index()
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __iter__(self) -> Iterator:
+        return iter(self.__index())
+
+    def __len__(self) -> int:
+        return len(self.__index())
+
+    def __repr__(self) -> str:
+        return f"LazyDict({list(self)})"
+
+    @property
+    def span(self) -> tuple[int, int]:
+        "The (start, end) offsets of this dict in the buffer, i.e. `buf[start:end]` is its exact bencoding."
+        self.__index()
+        return self.__start, self.__end
+
+    def materialize(self) -> dict:
+        "Decode the whole dict as `bdecode` does."
+        try:
+            return _bdecode(self.__buf, self.__start)[0]
+        except IndexError:
+            raise ValueError("Bdecode hits truncated content.") from None
+        except RecursionError:
+            raise ValueError("Bdecode hits too deeply nested content.") from None
+
+
+class LazyList(Sequence):
+    "A read-only bencoded list decoded on demand from its buffer, see `LazyDict`."
+
+    __slots__ = ("__buf", "__start", "__end", "__offsets")
+
+    def __init__(self, buf: bytes | bytearray | mmap.mmap, start: int):
+        self.__buf = buf
+        self.__start = start
+        self.__end = -1
+        self.__offsets: list[int] | None = None
+
+    def __index(self) -> list[int]:
+        if self.__offsets is None:
+            offsets = []
+            buf, pos = self.__buf, self.__start + 1
+            try:
+                while buf[pos] != _END:
+                    offsets.append(pos)
+                    pos = _skip(buf, pos)
+            except IndexError:
+                raise ValueError("Bdecode hits truncated content.") from None
+            except RecursionError:
+                raise ValueError("Bdecode hits too deeply nested content.") from None
+            self.__offsets, self.__end = offsets, pos + 1
+        return self.__offsets
+
+    def __getitem__(self, index: int | slice) -> LazyDict | LazyList | bytes | int | list:
+        if isinstance(index, slice):
+            return [_lazy(self.__buf, offset) for offset in self.__index()[index]]
+        return _lazy(self.__buf, self.__index()[index])
+
+    def __len__(self) -> int:
+        return len(self.__index())
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, list | LazyList):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None  # type: ignore
+
+    def __repr__(self) -> str:
+        return f"LazyList(<{len(self)} items>)"
+
+    @property
+    def span(self) -> tuple[int, int]:
+        "The (start, end) offsets of this list in the buffer."
+        self.__index()
+        return self.__start, self.__end
+
+    def materialize(self) -> list:
+        "Decode the whole list as `bdecode` does."
+        try:
+            return _bdecode(self.__buf, self.__start)[0]
+        except IndexError:
+            raise ValueError("Bdecode hits truncated content.") from None
+        except RecursionError:
+            raise ValueError("Bdecode hits too deeply nested content.") from None
+
+
+def bdecodeLazy(src: Union[PathObj, bytes, bytearray, mmap.mmap]) -> LazyDict | LazyList | bytes | int:
+    """
+    Decode a bencoded file or buffer on demand.
+    A file is memory-mapped, so only the pages of the accessed values are ever read,
+    e.g. reading `info.name` and the file lengths of a torrent never touches its `pieces`.
+    The mapping lives as long as any returned proxy. Malformed content is only reported when reached.
+
+    t = bdecodeLazy("a.torrent")
+    name, lengths = t["info"]["name"], [f["length"] for f in t["info"]["files"]]
+    """
+    if isinstance(src, bytes | bytearray | mmap.mmap):
+        buf = src
+    else:
+        with Path(src).open("rb") as fo:
+            if not Path(src).stat().st_size:
+                raise ValueError("Bdecode hits truncated content.")
+            buf = mmap.mmap(fo.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        return _lazy(buf, 0)
+    except IndexError:
+        raise ValueError("Bdecode hits truncated content.") from None
+    except RecursionError:
+        raise ValueError("Bdecode hits too deeply nested content.") from None
+
+
 def _decode(obj: int | str | bytes | list | dict, encoding: str) -> str | int | list | dict:
 
     if isinstance(obj, int | str):
@@ -77,24 +288,90 @@ def _decode(obj: int | str | bytes | list | dict, encoding: str) -> str | int |
         raise TypeError(f"Bdecode for torrent expects int|str|bytes|list|dict, not {type(obj)}.")
 
 
-def bencode(obj: int | str | bytes | list | dict, encoding: str = _ENCODING) -> bytes:
+_FLUSH_SIZE = 2**20  # 1 MiB
 
-    if isinstance(obj, bytes):
-        return str(len(obj)).encode(encoding) + b":" + obj
-    elif isinstance(obj, str):
-        return bencode(obj.encode(encoding))
-    elif isinstance(obj, int):
-        return b"i" + str(obj).encode(encoding) + b"e"
-    elif isinstance(obj, (list, tuple)):
-        return b"l" + b"".join(map(partial(bencode, encoding=encoding), obj)) + b"e"
-    elif isinstance(obj, dict):
-        ret = b"d"
-        for key, val in obj.items():
-            if isinstance(key, str | bytes):
-                ret += bencode(key, encoding) + bencode(val, encoding)
+
+def _iterDictItems(d: dict, encoding: str, sort_keys: bool) -> Iterator:
+    "Yield the encoded key and the value of each item in turn."
+    items = []
+    for key, val in d.items():
+        if isinstance(key, str):
+            key = key.encode(encoding)
+        elif not isinstance(key, bytes):
+            raise TypeError(f"Bencode expects dict key as str|bytes, not {type(key)}.")
+        if not sort_keys:
+            yield key
+            yield val
+        else:
+            items.append((key, val))
+    for key, val in sorted(items, key=lambda item: item[0]):
+        yield key
+        yield val
+
+
+def _bencode(obj, out: bytearray, encoding: str, sort_keys: bool, fo: Optional[BinaryIO] = None):
+    "Append the encoding of `obj` to `out` with an explicit stack, flushing `out` into `fo` if given."
+    stack: list[Iterator] = [iter((obj,))]
+    while stack:
+        for item in stack[-1]:
+            if isinstance(item, bytes):
+                out += b"%d:" % len(item)
+                if fo is not None and len(item) >= _FLUSH_SIZE:  # e.g. `pieces`, no need to copy it into `out`
+                    fo.write(out)
+                    fo.write(item)
+                    del out[:]
+                else:
+                    out += item
+            elif isinstance(item, str):
+                item = item.encode(encoding)
+                out += b"%d:" % len(item)
+                out += item
+            elif isinstance(item, int):
+                out += b"i%de" % item
+            elif isinstance(item, dict):
+                out += b"d"
+                stack.append(_iterDictItems(item, encoding, sort_keys))
+                break
+            elif isinstance(item, (list, tuple)):
+                out += b"l"
+                stack.append(iter(item))
+                break
             else:
-                raise TypeError(f"Bencode expects dict key as str|bytes, not {type(key)}.")
-        ret += b"e"
-        return ret
+                raise TypeError(f"Bencode expects int|bytes|str|list|dict, not {type(item)}.")
+            if fo is not None and len(out) >= _FLUSH_SIZE:
+                fo.write(out)
+                del out[:]
+        else:
+            stack.pop()
+            if stack:  # closing a list/dict, not the root
+                out += b"e"
+
+
+def bencode(obj: int | str | bytes | list | dict, encoding: str = _ENCODING, sort_keys: bool = False) -> bytes:
+    """
+    Encode an object in a single iterative pass into one buffer.
+
+    sort_keys: bool: write the dict keys sorted by their raw bytes as the bencoding spec requires,
+    otherwise in their insertion order
+    """
+    out = bytearray()
+    _bencode(obj, out, encoding, sort_keys)
+    return bytes(out)
+
+
+def bencodeTo(
+    obj: int | str | bytes | list | dict,
+    dst: Union[BinaryIO, bytearray],
+    encoding: str = _ENCODING,
+    sort_keys: bool = False,
+):
+    """
+    Encode an object straight into a bytearray or a binary file object, see `bencode`.
+    A file is written in blocks of about 1 MiB, so the memory stays flat however large the object is.
+    """
+    if isinstance(dst, bytearray):
+        _bencode(obj, dst, encoding, sort_keys)
     else:
-        raise TypeError(f"Bencode expects int|bytes|str|list|dict, not {type(obj)}.")
+        out = bytearray()
+        _bencode(obj, out, encoding, sort_keys, dst)
+        dst.write(out)
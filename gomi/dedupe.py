@@ -0,0 +1,165 @@
+"""This module provides duplicate file finding and hardlink deduplication over large trees."""
+
+from __future__ import annotations
+
+__all__ = ["findDuplicates", "dedupeByHardlink"]
+
+import sys  # fmt: skip
+if sys.version_info < (3, 10):
+    raise RuntimeError("This module requires Python 3.10.")
+
+import os
+import filecmp
+import hashlib
+import secrets
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from stat import S_ISREG
+from pathlib import Path
+from logging import Logger
+from typing import Callable, Hashable, Optional, Sequence, Union
+
+from .fs import iterFile, tryHardlink
+from .file import getFileSHA1
+from .__utils import PathObj
+
+
+_EDGE_SIZE = 2**16  # 64 KiB
+
+
+def _lstat(path: Path) -> Optional[os.stat_result]:
+    try:
+        return os.lstat(path)
+    except OSError:
+        return None
+
+
+def _getEdgeHash(path: Path, size: int, block_size: int) -> str:
+    "Hash the first and the last block of a file, which is the whole file if it is no larger than 2 blocks."
+    try:
+        hasher = hashlib.sha1()
+        with path.open("rb") as fo:
+            if size <= 2 * block_size:
+                hasher.update(fo.read())
+            else:
+                hasher.update(fo.read(block_size))
+                fo.seek(-block_size, os.SEEK_END)
+                hasher.update(fo.read(block_size))
+        return hasher.hexdigest()
+    except OSError:
+        return ""
+
+
+def _regroup(
+    pool: ThreadPoolExecutor,
+    groups: list[list[Path]],
+    key: Callable[[Path], Hashable],
+    inodes: dict[Path, tuple[int, int]],
+) -> list[list[Path]]:
+    """
+    Split each group by `key` computed in parallel, once per inode so a hardlinked file is read only once.
+    Keep the sub-groups with more than 1 inode, as the hardlinks of a single inode are not duplicates.
+    """
+    reps: dict[tuple[int, int], Path] = {}
+    for group in groups:
+        for p in group:
+            reps.setdefault(inodes[p], p)
+    keys = dict(zip(reps, pool.map(key, reps.values())))
+    ret: list[list[Path]] = []
+    for group in groups:
+        sub_groups: dict[Hashable, list[Path]] = defaultdict(list)
+        for p in group:
+            if (k := keys[inodes[p]]) not in (None, ""):  # failed to read
+                sub_groups[k].append(p)
+        ret += [g for g in sub_groups.values() if len({inodes[p] for p in g}) > 1]
+    return ret
+
+
+def findDuplicates(
+    *paths,  #! the argument is of PyTorch style
+    ext: Optional[Union[str, Sequence[str]]] = None,
+    min_size: int = 1,
+    block_size: int = _EDGE_SIZE,
+    workers: int = 8,
+) -> list[list[Path]]:
+    """
+    Find the groups of files with identical content under the inputs.
+    The candidates are narrowed in 3 stages, each run in a thread pool of `workers` threads:
+    by file size, by a hash of the first and last `block_size` bytes, then by the full SHA1.
+    So only the files sharing both their size and edges with another file are ever fully read.
+    Symlinks are skipped, as one is not a copy of its target and deleting it as such frees nothing.
+    The hardlinks of an inode are read once and reported together, a group always holds at least 2 inodes.
+
+    min_size: int: ignore the files smaller than this, the default skips empty files
+
+    return:list[list[Path]]: the sorted groups of duplicates, each with at least 2 sorted paths
+    """
+    files = list(dict.fromkeys(iterFile(*paths, ext=ext)))
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        stats = dict(zip(files, pool.map(_lstat, files)))
+        files = [p for p in files if (st := stats[p]) and S_ISREG(st.st_mode) and st.st_size >= min_size]
+        sizes = {p: stats[p].st_size for p in files}
+        inodes = {p: (stats[p].st_dev, stats[p].st_ino) for p in files}
+        groups = _regroup(pool, [files], sizes.__getitem__, inodes)
+        groups = _regroup(pool, groups, lambda p: _getEdgeHash(p, sizes[p], block_size), inodes)
+        # the edge hash already covers the whole content of the small files
+        done = [g for g in groups if sizes[g[0]] <= 2 * block_size]
+        groups = [g for g in groups if sizes[g[0]] > 2 * block_size]
+        groups = _regroup(pool, groups, lambda p: getFileSHA1(p, pass_error=True), inodes)
+    return sorted(sorted(g) for g in done + groups)
+
+
+def _replaceByHardlink(existing: Path, path: Path, logger: Optional[Logger] = None) -> bool:
+    tmp = path.with_name(f".{path.name}.{secrets.token_hex(4)}.link")
+    if not tryHardlink(existing, tmp):
+        return False
+    try:
+        os.replace(tmp, path)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+        return False
+    if logger:
+        logger.debug(f'Hardlinked "{path}" -> "{existing}".')
+    return True
+
+
+def dedupeByHardlink(
+    root: PathObj,
+    ext: Optional[Union[str, Sequence[str]]] = None,
+    min_size: int = 1,
+    verify: bool = True,
+    dry_run: bool = False,
+    workers: int = 8,
+    logger: Optional[Logger] = None,
+) -> int:
+    """
+    Replace the duplicate files under `root` by hardlinks to one canonical copy per device.
+    Each file is replaced atomically: a hardlink is made under a temporary name then renamed over it.
+    The canonical copy of a group is the one already having the most links, then the first in order.
+
+    verify: bool: compare the content byte-by-byte before replacing, on top of the SHA1 match
+    dry_run: bool: only count the bytes to reclaim without touching any file
+
+    return:int: the bytes reclaimed (or to reclaim), i.e. the size of the inodes losing their last link
+    """
+    reclaimed = 0
+    for group in findDuplicates(root, ext=ext, min_size=min_size, workers=workers):
+        by_dev: dict[int, list[tuple[Path, os.stat_result]]] = defaultdict(list)
+        for p in group:
+            st = p.stat()
+            by_dev[st.st_dev].append((p, st))
+        for files in by_dev.values():
+            canonical, canonical_st = max(files, key=lambda f: f[1].st_nlink)
+            by_ino: dict[int, list[tuple[Path, os.stat_result]]] = defaultdict(list)
+            for p, st in files:
+                if st.st_ino != canonical_st.st_ino:
+                    by_ino[st.st_ino].append((p, st))
+            for links in by_ino.values():
+                if verify and not filecmp.cmp(canonical, links[0][0], shallow=False):
+                    continue
+                if not dry_run and not all(_replaceByHardlink(canonical, p, logger) for p, _ in links):
+                    continue
+                # the inode is freed only if all its links are replaced
+                if links[0][1].st_nlink == len(links):
+                    reclaimed += links[0][1].st_size
+    return reclaimed
@@ -1,26 +1,247 @@
 from __future__ import annotations
 
-__all__ = ["getFileCRC32", "getFileSHA1", "File"]
+__all__ = ["getFileCRC32", "getFileSHA1", "getFileHashes", "hashFiles", "HashCache", "setHashCache", "File"]
 
 import sys
 
-if sys.version_info < (3, 9):
-    raise RuntimeError("This module requires Python 3.9.")
+if sys.version_info < (3, 10):
+    raise RuntimeError("This module requires Python 3.10.")
 
+import os
 import copy
+import mmap
 import zlib
+import sqlite3
 import hashlib
+import warnings
+import threading
 from os import PathLike
+from stat import S_ISREG
 from pathlib import Path
-from typing import Union
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Iterable, Iterator, Optional, Union
 
+from .hashing import combineCRC32
+from .__conf import _loadTuning
 from .__utils import PathObj
 
+try:
+    from tqdm import tqdm
+except ImportError:
+    pass
 
-_IO_SIZE = 16 * 2**20  # 16 MiB
 
+_IO_SIZE = 16 * 2**20  # 16 MiB, unless `benchmark.tuneIOSize` stored a better one for this machine
+if isinstance(_tuned := _loadTuning().get("io_size"), int) and _tuned > 0:
+    _IO_SIZE = _tuned
+_IO_MODE = "readinto"
+_MIN_CRC32_RANGE = 64 * 2**20  # 64 MiB, a smaller range is not worth a thread
 
-def getFileCRC32(path: PathObj, prefix: str = "", read_size: int = _IO_SIZE, pass_error: bool = False) -> str:
+
+class HashCache:
+    """
+    A SQLite store of file hashes keyed by (st_dev, st_ino, st_size, st_mtime_ns).
+    A changed file has a different key, so its old hashes are never returned and are replaced on the next put.
+    It is safe to share between threads.
+    """
+
+    def __init__(self, db_path: PathObj):
+        self.__lock = threading.Lock()
+        self.__conn = sqlite3.connect(Path(db_path), isolation_level=None, check_same_thread=False)
+        self.__conn.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS hashes (
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                algo TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                hash TEXT NOT NULL,
+                PRIMARY KEY (dev, ino, algo)
+            ) WITHOUT ROWID;
+            """
+        )
+
+    def close(self):
+        with self.__lock:
+            self.__conn.close()
+
+    def get(self, st: os.stat_result, algos: Iterable[str]) -> dict[str, str]:
+        "Return the cached hashes of the file of the given stat, only those still valid."
+        with self.__lock:
+            rows = self.__conn.execute(
+                "SELECT algo, hash FROM hashes WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ?",
+                (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns),
+            ).fetchall()
+        return {algo: hash for algo, hash in rows if algo in algos}
+
+    def put(self, st: os.stat_result, st_after: os.stat_result, hashes: dict[str, str]):
+        "Store the hashes computed between 2 stats of a file, unless the file changed in between."
+        if (st.st_size, st.st_mtime_ns) != (st_after.st_size, st_after.st_mtime_ns):
+            return
+        key = (st.st_dev, st.st_ino)
+        with self.__lock, self.__conn:
+            self.__conn.execute("BEGIN")
+            self.__conn.execute(
+                "DELETE FROM hashes WHERE dev = ? AND ino = ? AND (size != ? OR mtime_ns != ?)",
+                (*key, st.st_size, st.st_mtime_ns),
+            )
+            self.__conn.executemany(
+                "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?)",
+                ((*key, algo, st.st_size, st.st_mtime_ns, hash) for algo, hash in hashes.items()),
+            )
+
+
+_HASH_CACHE: Optional[HashCache] = None
+
+
+def setHashCache(db_path: Optional[PathObj]) -> Optional[HashCache]:
+    """
+    Make all the file hashing functions (and so `File`) look up and fill the given on-disk cache.
+    Use None to stop using the current one.
+    """
+    global _HASH_CACHE
+    if _HASH_CACHE:
+        _HASH_CACHE.close()
+    _HASH_CACHE = HashCache(db_path) if db_path else None
+    return _HASH_CACHE
+
+
+class _CRC32:
+    "A hashlib-like wrapper of `zlib.crc32`."
+
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data):
+        self.value = zlib.crc32(data, self.value)
+
+    def hexdigest(self) -> str:
+        return f"{self.value:08x}"
+
+
+_HASHERS = {
+    "crc32": _CRC32,
+    "md5": hashlib.md5,
+    "sha1": hashlib.sha1,
+    "sha256": hashlib.sha256,
+    "blake2b": hashlib.blake2b,
+    "blake2s": hashlib.blake2s,
+}
+
+
+def _iterChunks(fo: BinaryIO, read_size: int, mode: str) -> Iterator[Union[bytes, memoryview]]:
+    match mode:
+        case "read":
+            while b := fo.read(read_size if read_size > 0 else -1):
+                yield b
+        case "readinto":
+            # never allocate (and zero-fill) more than the file needs, +1 to see the EOF in the same buffer
+            size = os.fstat(fo.fileno()).st_size + 1
+            buffer = bytearray(min(read_size, size) if read_size > 0 else size)
+            view = memoryview(buffer)
+            while n := fo.readinto(buffer):
+                with view[:n] as b:
+                    yield b
+        case "mmap":
+            if not (size := os.fstat(fo.fileno()).st_size):
+                return  # an empty file cannot be mapped
+            step = read_size if read_size > 0 else size
+            with mmap.mmap(fo.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                for i in range(0, size, step):
+                    with view[i : i + step] as b:
+                        yield b
+        case _:
+            raise ValueError(f'Unknown read mode "{mode}".')
+
+
+def _getRangeCRC32(path: PathObj, start: int, length: int, read_size: int) -> int:
+    "CRC32 of `length` bytes from `start`, read through an own file handle so the ranges never share an offset."
+    crc = 0
+    buffer = bytearray(min(read_size if read_size > 0 else length, length) or 1)
+    view = memoryview(buffer)
+    with Path(path).open("rb", buffering=0) as fo:
+        fo.seek(start)
+        while length > 0 and (n := fo.readinto(view[: min(length, len(buffer))])):
+            crc = zlib.crc32(view[:n], crc)
+            length -= n
+    return crc
+
+
+def _getFileCRC32Parallel(path: PathObj, size: int, workers: int, read_size: int) -> int:
+    "Split the file into ranges, CRC32 them in threads and merge the results with `combineCRC32`."
+    step = max(-(-size // workers), _MIN_CRC32_RANGE)
+    ranges = [(start, min(step, size - start)) for start in range(0, size, step)]
+    with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+        crcs = list(pool.map(lambda r: _getRangeCRC32(path, *r, read_size), ranges))
+    crc = crcs[0]
+    for (_, length), range_crc in zip(ranges[1:], crcs[1:]):
+        crc = combineCRC32(crc, range_crc, length)
+    return crc
+
+
+def getFileHashes(
+    path: PathObj,
+    algos: Iterable[str] = ("crc32", "sha1"),
+    read_size: int = _IO_SIZE,
+    pass_error: bool = False,
+    mode: str = _IO_MODE,
+    workers: int = 1,
+) -> dict[str, str]:
+    """
+    path: PathObj: the Path to the file
+    algos: Iterable[str]: any of "crc32", "md5", "sha1", "sha256", "blake2b", "blake2s"
+
+    readsize:int: the read size limit in bytes in each hash update
+    default is 16 MiB, using <=0 means full read without blocks
+
+    mode:str: how the file is read
+    "read" allocates a new bytes object for each block
+    "readinto" reads into a single reused buffer and feeds the hashers with memoryview slices
+    "mmap" maps the file and feeds the hashers with slices of the mapping, best for files on local disks
+
+    workers:int: if CRC32 is the only hash to compute, split a large file into ranges hashed by this many threads
+    the result is identical to the serial one, other algos cannot be split so they ignore it
+
+    return:dict[str, str]: the hash string of each algo, all computed over a single read of the file
+    """
+    algos = list(dict.fromkeys(algo.lower() for algo in algos))
+    if unknown := [algo for algo in algos if algo not in _HASHERS]:
+        raise ValueError(f"Unsupported hash algorithm {unknown}.")
+    try:
+        with Path(path).open("rb") as fo:
+            st = os.fstat(fo.fileno())
+            ret = _HASH_CACHE.get(st, algos) if _HASH_CACHE else {}
+            missing = [algo for algo in algos if algo not in ret]
+            if missing == ["crc32"] and workers > 1 and st.st_size > _MIN_CRC32_RANGE:
+                hashes = {"crc32": f"{_getFileCRC32Parallel(path, st.st_size, workers, read_size):08x}"}
+            elif missing:
+                hashers = [_HASHERS[algo]() for algo in missing]
+                for b in _iterChunks(fo, read_size, mode):
+                    for hasher in hashers:
+                        hasher.update(b)
+                hashes = {algo: hasher.hexdigest() for algo, hasher in zip(missing, hashers)}
+            if missing:
+                if _HASH_CACHE:
+                    _HASH_CACHE.put(st, os.fstat(fo.fileno()), hashes)
+                ret.update(hashes)
+        return {algo: ret[algo] for algo in algos}
+    except Exception as e:
+        if pass_error:
+            return {algo: "" for algo in algos}
+        raise e
+
+
+def getFileCRC32(
+    path: PathObj,
+    prefix: str = "",
+    read_size: int = _IO_SIZE,
+    pass_error: bool = False,
+    mode: str = _IO_MODE,
+    workers: int = 1,
+) -> str:
     """
     path: PathObj: the Path to the file
     prefix: str: append to the front of the hash string
@@ -30,23 +251,20 @@ def getFileCRC32(path: PathObj, prefix: str = "", read_size: int = _IO_SIZE, pas
     a higher value may reduce the total time consumption as it reduces the IO times
     but when using a multi-processing reader, too large read size may cause OOM
 
+    mode:str: "read", "readinto" or "mmap", see `getFileHashes`
+    workers:int: hash the ranges of a large file in this many threads and combine them, see `getFileHashes`
+
     return:str: the hash string
 
     typical speed: 500-1500MB/s on NVMe SSD per thread
     """
-    try:
-        hash = 0
-        with Path(path).open("rb") as fo:
-            while b := fo.read(read_size):
-                hash = zlib.crc32(b, hash)
-        return f"{prefix}{hash:08x}"
-    except Exception as e:
-        if pass_error:
-            return ""
-        raise e
+    hash = getFileHashes(path, ("crc32",), read_size, pass_error, mode, workers)["crc32"]
+    return f"{prefix}{hash}" if hash else ""
 
 
-def getFileSHA1(path: PathObj, prefix: str = "", read_size: int = _IO_SIZE, pass_error: bool = False) -> str:
+def getFileSHA1(
+    path: PathObj, prefix: str = "", read_size: int = _IO_SIZE, pass_error: bool = False, mode: str = _IO_MODE
+) -> str:
     """
     path: PathObj: the Path to the file
     prefix: str: append to the front of the hash string
@@ -56,35 +274,90 @@ def getFileSHA1(path: PathObj, prefix: str = "", read_size: int = _IO_SIZE, pass
     a higher value may reduce the total time consumption as it reduces the IO times
     but when using a multi-processing reader, too large read size may cause OOM
 
+    mode:str: "read", "readinto" or "mmap", see `getFileHashes`
+
     return:str: the hash string
 
     typical speed: 500-2000MB/s on NVMe SSD per thread
     """
+    hash = getFileHashes(path, ("sha1",), read_size=read_size, pass_error=pass_error, mode=mode)["sha1"]
+    return f"{prefix}{hash}" if hash else ""
+
+
+def _isSSD(path: Path) -> bool:
     try:
-        hasher = hashlib.sha1()
-        with Path(path).open("rb") as fo:
-            while b := fo.read(read_size):
-                hasher.update(b)
-        return f"{prefix}{hasher.hexdigest()}"
-    except Exception as e:
-        if pass_error:
-            return ""
-        raise e
+        from .device import isSSD
+    except ImportError:
+        return True  # without ssd_checker, assume a device that likes parallel reads
+    return isSSD(path, fallback=True)
+
+
+def hashFiles(
+    paths: Iterable[PathObj],
+    algos: Iterable[str] = ("crc32",),
+    workers: Optional[int] = None,
+    read_size: int = _IO_SIZE,
+    pass_error: bool = False,
+    mode: str = _IO_MODE,
+    _tqdm: bool = False,
+) -> Iterator[dict[str, str]]:
+    """
+    Hash many files with `getFileHashes` in threads, as both `hashlib` and `zlib` release the GIL.
+    The files are grouped by their device, each SSD gets a pool of `workers` threads
+    while each HDD gets a single sequential reader so its head is not thrashed by parallel reads.
+
+    workers: Optional[int]: the number of threads per SSD, default to `min(32, os.cpu_count() + 4)`
+
+    return:Iterator[dict[str, str]]: the hashes of each file, streamed in the input order
+    """
+    paths = [Path(p) for p in paths]
+    algos = tuple(algos)
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+
+    pools: dict[Optional[int], ThreadPoolExecutor] = {}
+    futures: list[Future] = []
+    try:
+        for path in paths:
+            try:
+                dev = path.stat().st_dev
+            except OSError:
+                dev = None  # let the hashing report the error
+            if dev not in pools:
+                n = workers if dev is None or _isSSD(path) else 1
+                pools[dev] = ThreadPoolExecutor(max_workers=n)
+            futures.append(pools[dev].submit(getFileHashes, path, algos, read_size, pass_error, mode))
+
+        if _tqdm and "tqdm" in globals():
+            futures = tqdm(futures, ascii=True)
+        elif _tqdm:
+            warnings.warn("Missing tqdm. Ignoring given tqdm option.")
+        for future in futures:
+            yield future.result()
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
 
 
 class File:
 
     "A read-only file object to access file information."
 
+    __slots__ = ("__path", "__caching", "__stat", "__cache")
+
     def __init__(self, path: Union[str, PathLike], resolve: bool = True, caching: bool = True):
 
         path = Path(path).resolve() if resolve else Path(path)
-        if not path.is_file():
+        try:
+            st = path.stat()
+        except OSError:
+            st = None
+        if st is None or not S_ISREG(st.st_mode):
             raise FileNotFoundError(f'File "{path}" not found')
 
         self.__path: Path = path
         self.__caching: bool = caching
-        self.__cache: dict[str, str] = {}
+        self.__stat: os.stat_result = st
+        self.__cache: Optional[dict[str, str]] = None  #! created on the first hashing to keep the object small
 
     # * file system info -----------------------------------------------------------------------------------------------
 
@@ -114,30 +387,40 @@ class File:
 
     # * file information -----------------------------------------------------------------------------------------------
 
+    @property
+    def stat(self) -> os.stat_result:
+        "The stat result taken at creation, or a fresh one if caching is disabled."
+        return self.__stat if self.__caching else self.__path.stat()
+
     @property
     def size(self) -> int:
-        return self.__path.stat().st_size
+        return self.stat.st_size
+
+    @property
+    def mtime(self) -> int:
+        "The modification time in nanoseconds."
+        return self.stat.st_mtime_ns
 
     # * file hashing ---------------------------------------------------------------------------------------------------
 
+    def hashes(self, *algos: str) -> dict[str, str]:
+        "Return the hash strings of the given algos, computing all the uncached ones in a single read."
+        algos = tuple(algo.lower() for algo in algos)
+        cache = self.__cache or {}
+        if missing := [algo for algo in algos if algo not in cache]:
+            hashes = getFileHashes(self.__path, missing, pass_error=False)
+            if not all(hashes.values()):
+                raise RuntimeError(f'Unexpected failure on {missing} calculation for file: "{self.__path}"')
+            if not self.__caching:
+                return {algo: hashes[algo] for algo in algos}
+            cache.update(hashes)
+            self.__cache = cache
+        return {algo: cache[algo] for algo in algos}
+
     @property
     def crc32(self) -> str:
-        if crc32 := self.__cache.get("crc32"):
-            return crc32
-        else:
-            if crc32 := getFileCRC32(self.__path, pass_error=False):
-                if self.__caching:
-                    self.__cache["crc32"] = crc32
-                return crc32
-            raise RuntimeError(f'Unexpected failure on CRC32 calculation for file: "{self.__path}"')
+        return self.hashes("crc32")["crc32"]
 
     @property
     def sha1(self) -> str:
-        if sha1 := self.__cache.get("sha1"):
-            return sha1
-        else:
-            if sha1 := getFileSHA1(self.__path, pass_error=False):
-                if self.__caching:
-                    self.__cache["sha1"] = sha1
-                return sha1
-            raise RuntimeError(f'Unexpected failure on SHA1 calculation for file: "{self.__path}"')
+        return self.hashes("sha1")["sha1"]
@@ -0,0 +1,149 @@
+"""This module provides a columnar container of file records for library-scale inventories."""
+
+from __future__ import annotations
+
+__all__ = ["FileSet"]
+
+import sys  # fmt: skip
+if sys.version_info < (3, 10):
+    raise RuntimeError("This module requires Python 3.10.")
+
+import os
+from pathlib import Path
+from stat import S_ISREG
+from typing import Iterable, Iterator, Optional, Sequence, Union
+
+import numpy as np
+
+from .fs import _suffix, listFile
+from .file import hashFiles
+from .__utils import PathObj
+
+
+class FileSet:
+    """
+    A read-only set of file records stored as NumPy columns instead of one `File` object per file.
+    Each column is an array of the same length: path (object of str), size and mtime (int64, ns), extension
+    (str, lower-cased without the dot as `File.extension`) and any computed digest (bytes of the hex string).
+    Filtering and sorting return a new `FileSet` sharing nothing mutable with the original.
+    """
+
+    __slots__ = ("__paths", "__sizes", "__mtimes", "__exts", "__digests")
+
+    def __init__(self, paths: Iterable[PathObj] = ()):
+        paths = [os.fspath(p) for p in paths]
+        sizes = np.empty(len(paths), dtype=np.int64)
+        mtimes = np.empty(len(paths), dtype=np.int64)
+        for i, p in enumerate(paths):
+            try:
+                st = os.stat(p)
+            except OSError:
+                st = None
+            if st is None or not S_ISREG(st.st_mode):
+                raise FileNotFoundError(f'File "{p}" not found')
+            sizes[i] = st.st_size
+            mtimes[i] = st.st_mtime_ns
+        self.__paths = np.empty(len(paths), dtype=object)
+        self.__paths[:] = paths
+        self.__sizes = sizes
+        self.__mtimes = mtimes
+        self.__exts = np.array([_suffix(os.path.basename(p)).lower().lstrip(".") for p in paths], dtype=str)
+        self.__digests: dict[str, np.ndarray] = {}
+
+    @classmethod
+    def fromDir(cls, *paths, ext: Optional[Union[str, Sequence[str]]] = None, workers: int = 0) -> FileSet:
+        "Build a `FileSet` of `fs.listFile(*paths, ext=ext)`."
+        return cls(listFile(*paths, ext=ext, workers=workers))
+
+    def __take(self, index: Union[slice, np.ndarray]) -> FileSet:
+        ret = object.__new__(FileSet)
+        ret.__paths = self.__paths[index]
+        ret.__sizes = self.__sizes[index]
+        ret.__mtimes = self.__mtimes[index]
+        ret.__exts = self.__exts[index]
+        ret.__digests = {algo: digests[index] for algo, digests in self.__digests.items()}
+        return ret
+
+    @staticmethod
+    def __readonly(column: np.ndarray) -> np.ndarray:
+        view = column.view()
+        view.flags.writeable = False
+        return view
+
+    # * container ------------------------------------------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.__paths)
+
+    def __iter__(self) -> Iterator[Path]:
+        return map(Path, self.__paths)
+
+    def __getitem__(self, index: Union[int, slice, Sequence[int], np.ndarray]) -> Union[Path, FileSet]:
+        "An int gives the path of one record, a slice/index array/bool mask gives a new `FileSet`."
+        if isinstance(index, (int, np.integer)):
+            return Path(self.__paths[index])
+        if not isinstance(index, slice):
+            index = np.asarray(index)
+            # an empty list would be float64, which numpy refuses as an index
+            index = index if index.dtype == bool else index.astype(np.intp)
+        return self.__take(index)
+
+    # * columns --------------------------------------------------------------------------------------------------------
+
+    @property
+    def paths(self) -> np.ndarray:
+        return self.__readonly(self.__paths)
+
+    @property
+    def sizes(self) -> np.ndarray:
+        return self.__readonly(self.__sizes)
+
+    @property
+    def mtimes(self) -> np.ndarray:
+        return self.__readonly(self.__mtimes)
+
+    @property
+    def exts(self) -> np.ndarray:
+        return self.__readonly(self.__exts)
+
+    def digests(self, algo: str) -> np.ndarray:
+        "Return the digest column of `algo`, which must have been computed by `hash`."
+        if (digests := self.__digests.get(algo.lower())) is None:
+            raise KeyError(f'Digest "{algo}" is not computed yet.')
+        return self.__readonly(digests)
+
+    # * filtering and sorting ------------------------------------------------------------------------------------------
+
+    def filter(self, mask: np.ndarray) -> FileSet:
+        "Keep the records where the bool mask is True, e.g. `fileset.filter(fileset.sizes > 2**30)`."
+        return self.__take(np.asarray(mask, dtype=bool))
+
+    def withExt(self, *exts: str) -> FileSet:
+        "Keep the records with any of the given extensions, case-insensitive and with or without the dot."
+        return self.filter(np.isin(self.__exts, [ext.lower().lstrip(".") for ext in exts]))
+
+    def withDigest(self, algo: str, digest: str) -> FileSet:
+        "Keep the records with the given digest."
+        return self.filter(self.digests(algo) == digest.lower().encode("ascii"))
+
+    def sortBy(self, *keys: str, reverse: bool = False) -> FileSet:
+        """
+        Sort the records by the given keys, the first one being the primary.
+        keys: str: any of "path", "size", "mtime", "ext" or a computed digest algo, default to "path"
+        """
+        columns = {"path": self.__paths, "size": self.__sizes, "mtime": self.__mtimes, "ext": self.__exts}
+        order = np.arange(len(self))
+        for key in reversed(keys or ("path",)):
+            column = columns[key] if key in columns else self.digests(key)
+            order = order[np.argsort(column[order], kind="stable")]
+        return self.__take(order[::-1] if reverse else order)
+
+    # * hashing --------------------------------------------------------------------------------------------------------
+
+    def hash(self, *algos: str, workers: Optional[int] = None, _tqdm: bool = False) -> FileSet:
+        "Compute the digest columns of `algos` not computed yet with `file.hashFiles`, in place."
+        if missing := [algo for algo in dict.fromkeys(a.lower() for a in algos) if algo not in self.__digests]:
+            rows = list(hashFiles(self.__paths, missing, workers=workers, _tqdm=_tqdm))
+            for algo in missing:
+                self.__digests[algo] = np.array([row[algo] for row in rows], dtype=bytes)
+        return self
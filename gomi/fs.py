@@ -1,9 +1,14 @@
 from __future__ import annotations
 
 __all__ = [
+    "PathTrie",
     "WindowsPathJ",
     "condenseDirLayout",
+    "copyFile",
+    "detectFileEncoding",
     "findCommonParentDir",
+    "iterDir",
+    "iterFile",
     "listDir",
     "listFile",
     "proposeDstParentDir",
@@ -11,6 +16,7 @@ __all__ = [
     "tryCopy",
     "tryHardlink",
     "tryHardlinkThenCopy",
+    "tryHardlinkThenCopyBatch",
     "tryMkDir",
     "tstFileEncoding",
     "tstMkHardlink",
@@ -23,11 +29,17 @@ if sys.version_info < (3, 10):
     raise RuntimeError("This module requires Python 3.10.")
 
 import os
+import stat
+import codecs
+import errno
 import random
+import itertools
 import warnings
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path, WindowsPath
 from logging import Logger
-from typing import Optional, Sequence, Union
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence, Union
 
 
 from .vars import DEBUG
@@ -57,29 +69,122 @@ else:
             return super().__new__(cls, *args, **kwargs)
 
 
-def listFile(
+def _suffix(name: str) -> str:
+    # same rule as `PurePath.suffix` but without building a Path object for every entry
+    i = name.rfind(".")
+    return name[i:] if 0 < i < len(name) - 1 else ""
+
+
+def _readDir(path: str, rglob: bool = True) -> tuple[list[os.DirEntry], list[str]]:
+    """
+    Read one dir and return its entries and the subdirs to descend into.
+    The type of every entry is resolved here so the `os.DirEntry` cache is warm for the caller.
+    """
+    try:
+        with os.scandir(path) as it:
+            entries = list(it)
+    except PermissionError:
+        return [], []
+    subdirs: list[str] = []
+    for entry in entries:
+        if entry.is_dir():
+            if rglob and not entry.is_symlink():
+                subdirs.append(entry.path)
+        else:
+            entry.is_file()
+    return entries, subdirs
+
+
+def _scanDir(root: str, rglob: bool = True) -> Iterator[os.DirEntry]:
+    """
+    Yield the `os.DirEntry` under `root` in the same pre-order as `Path.rglob("*")`.
+    Symlinked dirs are yielded but not descended into, unreadable dirs are skipped silently.
+    """
+    stack = [root]
+    while stack:
+        entries, subdirs = _readDir(stack.pop(), rglob=rglob)
+        yield from entries
+        stack.extend(reversed(subdirs))
+
+
+def _scanDirParallel(root: str, rglob: bool = True, workers: int = 8) -> Iterator[os.DirEntry]:
+    """
+    Same as `_scanDir` but the dirs are read by a thread pool.
+    Every found subdir is queued at once and picked up by whichever worker is idle,
+    while the results are still consumed in pre-order so the output order is identical to `_scanDir`.
+    This helps on storage with high metadata latency (NAS, HDD), where a single walker mostly waits.
+    """
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        stack = [pool.submit(_readDir, root, rglob)]
+        while stack:
+            entries, subdirs = stack.pop().result()
+            stack.extend(reversed([pool.submit(_readDir, subdir, rglob) for subdir in subdirs]))
+            yield from entries
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iterFile(
     *paths,  #! the argument is of PyTorch style
     ext: Optional[Union[str, Sequence[str]]] = None,
     rglob: bool = True,
-    reduce: bool = True,
-    sort: bool = True,
-) -> list[Path]:
-    paths = [Path(Path(p).as_posix()) for p in paths]
-    ret: list[Path] = []
+    workers: int = 0,
+) -> Iterator[Path]:
+    """
+    The streaming version of `listFile`, without reducing or sorting.
+    The type info cached in `os.DirEntry` is reused so no extra stat is spent on each entry.
+    workers: int: use a thread pool of this size to read dirs, <=1 means a serial walk
+    """
+    scan = partial(_scanDirParallel, workers=workers) if workers > 1 else _scanDir
+    exts = ((ext,) if isinstance(ext, str) else tuple(ext)) if ext else None
     for p in paths:
+        p = Path(Path(p).as_posix())
         if p.is_file():
-            ret.append(p)
+            if not exts or p.suffix.lower().endswith(exts):
+                yield p
             continue
         if p.is_dir():
-            ret += [f for f in p.rglob("*") if f.is_file()] if rglob else [f for f in p.glob("*") if f.is_file()]
-    if ext:
-        exts = (ext,) if isinstance(ext, str) else tuple(ext)
-        ret = [p for p in ret if p.suffix.lower().endswith(exts)]
+            for entry in scan(str(p), rglob=rglob):
+                if exts and not _suffix(entry.name).lower().endswith(exts):
+                    continue
+                if entry.is_file():
+                    yield Path(entry.path)
+
+
+def iterDir(
+    *paths,  #! the argument is of PyTorch style
+    rglob: bool = True,
+    workers: int = 0,
+) -> Iterator[Path]:
+    """
+    The streaming version of `listDir`, without reducing or sorting.
+    The type info cached in `os.DirEntry` is reused so no extra stat is spent on each entry.
+    workers: int: use a thread pool of this size to read dirs, <=1 means a serial walk
+    """
+    scan = partial(_scanDirParallel, workers=workers) if workers > 1 else _scanDir
+    for p in paths:
+        p = Path(Path(p).as_posix())
+        if p.is_dir():
+            if rglob:
+                yield p
+            for entry in scan(str(p), rglob=rglob):
+                if entry.is_dir():
+                    yield Path(entry.path)
+
+
+def listFile(
+    *paths,  #! the argument is of PyTorch style
+    ext: Optional[Union[str, Sequence[str]]] = None,
+    rglob: bool = True,
+    reduce: bool = True,
+    sort: bool = True,
+    workers: int = 0,
+) -> list[Path]:
+    ret = iterFile(*paths, ext=ext, rglob=rglob, workers=workers)
     if reduce:
-        ret = list(set(ret))
-    if sort:
-        ret = sorted(ret)
-    return ret
+        ret = dict.fromkeys(ret)
+    return sorted(ret) if sort else list(ret)
 
 
 def listDir(
@@ -87,17 +192,56 @@ def listDir(
     rglob: bool = True,
     reduce: bool = True,
     sort: bool = True,
+    workers: int = 0,
 ) -> list[Path]:
-    inp_paths = list(Path(Path(p).as_posix()) for p in inp_paths)
-    ret: list[Path] = []
-    for p in inp_paths:
-        if p.is_dir():
-            ret += [p] + [f for f in p.rglob("*") if f.is_dir()] if rglob else [f for f in p.glob("*") if f.is_dir()]
+    ret = iterDir(*inp_paths, rglob=rglob, workers=workers)
     if reduce:
-        ret = list(set(ret))
-    if sort:
-        ret = sorted(ret)
-    return ret
+        ret = dict.fromkeys(ret)
+    return sorted(ret) if sort else list(ret)
+
+
+_BOMS = {"utf-8-sig": codecs.BOM_UTF8, "utf-16-le": codecs.BOM_UTF16_LE, "utf-16-be": codecs.BOM_UTF16_BE}
+_ENCODINGS = ("utf-8-sig", "utf-16-le", "utf-16-be", "utf-8")
+_DECODE_SIZE = 2**20  # 1 MiB
+
+
+def detectFileEncoding(
+    path: PathObj, encodings: Sequence[str] = _ENCODINGS, read_size: int = _DECODE_SIZE
+) -> Optional[str]:
+    """
+    Test all the candidate encodings on a file in a single chunked read with bounded memory.
+    The utf-8-sig/utf-16-le/utf-16-be candidates also require the file to start with the corresponding BOM.
+
+    encodings: Sequence[str]: the candidates in order of preference, so put the specific ones first,
+    e.g. the BOM ones before utf-8 and utf-8 before any legacy code page
+
+    return:Optional[str]: the first candidate decoding the file without issue, or None if there is none
+    """
+    path = Path(path)
+    if not path.is_file():
+        return None
+
+    decoders = {enc: codecs.getincrementaldecoder(enc)(errors="strict") for enc in encodings}
+    buffer = bytearray(max(read_size, 4))
+    view = memoryview(buffer)
+    with path.open("rb") as fo:
+        n = fo.readinto(buffer)
+        for enc in list(decoders):
+            if (bom := _BOMS.get(codecs.lookup(enc).name)) and not buffer[:n].startswith(bom):
+                del decoders[enc]
+        while decoders and n:
+            for enc, decoder in list(decoders.items()):
+                try:
+                    decoder.decode(view[:n])
+                except UnicodeError:
+                    del decoders[enc]
+            n = fo.readinto(buffer)
+    for enc, decoder in list(decoders.items()):
+        try:
+            decoder.decode(b"", final=True)
+        except UnicodeError:
+            del decoders[enc]
+    return next(iter(decoders), None)
 
 
 def tstFileEncoding(path: Path, encoding: str = "utf-8-sig") -> bool:
@@ -105,114 +249,285 @@ def tstFileEncoding(path: Path, encoding: str = "utf-8-sig") -> bool:
 
     # TODO integrate with chardet to achieve a better result?
 
-    try:
-        path = Path(path)
-        assert path.is_file()
-        raw_data = path.read_bytes()
-        match encoding.lower():
-            case "utf-8-sig" | "utf_8_sig":
-                assert raw_data[:3] == b"\xef\xbb\xbf"
-            case "utf-16-le" | "utf_16_le":
-                assert raw_data[:2] == b"\xff\xfe"
-            case "utf-16-be" | "utf_16_be":
-                assert raw_data[:2] == b"\xfe\xff"
-        path.read_text(encoding=encoding, errors="strict")
-    except AssertionError:
-        return False
-    except UnicodeError:
-        return False
-    return True
+    return detectFileEncoding(path, (encoding,)) is not None
 
 
-def findCommonParentDir(paths: Sequence[Union[str, Path]]) -> Optional[Path]:
+class PathTrie:
+    """
+    A trie of path components built purely from the input strings, without touching the file system.
+    Unlike a string prefix, a common prefix found by it never splits a path component in the middle.
+    """
 
-    ps = [Path(p).resolve() for p in paths]
+    def __init__(self, paths: Iterable[PathObj] = ()):
+        self.__root: dict = {}
+        self.__size: int = 0
+        self.__dirs: dict[str, dict] = {}  # parsed parent dirs, as a batch mostly shares a few of them
+        for path in paths:
+            self.add(path)
 
-    # NOTE this function may have a bug if some inputs are not existing
-    assert all(p.exists() for p in ps), "Some input paths do not exist."
+    def __len__(self) -> int:
+        return self.__size
 
-    if len(ps) == 1 and ps[0].is_file():
-        return ps[0].parent
-    if len(ps) == 1 and ps[0].is_dir():
-        return ps[0]
+    def __contains__(self, path: PathObj) -> bool:
+        node = self.__root
+        for part in Path(path).parts:
+            if (node := node.get(part)) is None:
+                return False
+        return None in node
+
+    def add(self, path: PathObj):
+        head, tail = os.path.split(os.fspath(path))
+        if (node := self.__dirs.get(head)) is None:
+            node = self.__root
+            for part in Path(head).parts:
+                node = node.setdefault(part, {})
+            self.__dirs[head] = node
+        if tail and tail != ".":
+            node = node.setdefault(tail, {})
+        if None not in node:  # the key `None` marks the end of an input path
+            node[None] = None
+            self.__size += 1
+
+    def commonPrefix(self) -> Optional[Path]:
+        "Return the deepest path shared by all the inputs, or None if there is none."
+        parts: list[str] = []
+        node = self.__root
+        while len(node) == 1 and None not in node:
+            part, node = next(iter(node.items()))
+            parts.append(part)
+        return Path(*parts) if parts else None
+
+
+def findCommonParentDir(paths: Sequence[Union[str, Path]], resolve: bool = True) -> Optional[Path]:
+    """
+    Find the deepest common parent dir of the inputs, comparing whole path components.
+    resolve: bool: resolve the inputs first, use False for already resolved paths to avoid any syscall per path
+    """
 
-    fullpaths = [p.as_posix() for p in ps]
-    common_prefix = os.path.commonprefix(fullpaths)
-    if not common_prefix:
+    trie = PathTrie((Path(p).resolve() for p in paths) if resolve else paths)
+    if (common := trie.commonPrefix()) is None:
         return None
-    common_prefix = Path(common_prefix)
-    if common_prefix.is_dir():
-        return common_prefix
-    return common_prefix.parent
+    # the common path is a dir for sure if it is not an input itself, otherwise only the file system can tell
+    if common in trie and not common.is_dir():
+        return common.parent
+    return common
 
 
-def proposeFilePath(paths: Sequence[Path], dst_filename: str, logger: Optional[Logger] = None) -> Path:
+def proposeFilePath(
+    paths: Sequence[Path], dst_filename: str, logger: Optional[Logger] = None, resolve: bool = True
+) -> Path:
     paths = list(paths)
     if not paths:
         raise ValueError(GOT_NO_INPUT_0)
     call = logger.info if logger else (lambda msg: print(msg))
-    common_parent = findCommonParentDir(paths)
+    common_parent = findCommonParentDir(paths, resolve=resolve)
     if not common_parent:
         dst_path = paths[0].parent / dst_filename
         call(CANT_PROPOSE_COMMON_PARENT_FOR_LOG_1.format(dst_path))
-    elif common_parent.is_dir():
-        dst_path = common_parent / dst_filename
     else:
-        dst_path = common_parent.parent / dst_filename
+        dst_path = common_parent / dst_filename
     return dst_path
 
 
-def proposeDstParentDir(paths: Sequence[Path], logger: Optional[Logger] = None) -> Path:
+def proposeDstParentDir(paths: Sequence[Path], logger: Optional[Logger] = None, resolve: bool = True) -> Path:
     paths = list(paths)
     if not paths:
         raise ValueError(GOT_NO_INPUT_0)
     call = logger.info if logger else (lambda msg: print(msg))
-    common_parent = findCommonParentDir(paths)
+    common_parent = findCommonParentDir(paths, resolve=resolve)
     if not common_parent:
         dst_parent = paths[0].parent.parent
         call(CANT_PROPOSE_COMMON_PARENT_FOR_LOG_1.format(dst_parent))
-    elif common_parent.is_dir():
-        dst_parent = common_parent.parent
     else:
-        dst_parent = common_parent.parent.parent
+        dst_parent = common_parent.parent
     return dst_parent
 
 
-def condenseDirLayout(root: Path):
+def _condenseDir(
+    path: Path, is_root: bool, plan: list[tuple[Path, Optional[Path]]], dry_run: bool
+) -> Optional[tuple[list[str], list[str]]]:
+    """
+    The post-order worker of `condenseDirLayout`.
+    Return the (non-dir names, dir names) of `path` after condensing it, or None if it is removed.
+    Anything other than a real dir (files, symlinks, etc.) is a leaf and never moved into or removed.
+    """
+
+    def apply(src: Path, dst: Optional[Path]):
+        plan.append((src, dst))
+        if dry_run:
+            return
+        if dst is None:
+            src.rmdir()
+            return
+        if dst.exists():
+            raise FileExistsError(f'The new path "{dst}" already exists.')
+        src.rename(dst)
+        if DEBUG:
+            print(f'Moved "{src}" -> "{dst}".')
+
+    leaves: list[str] = []
+    children: dict[str, tuple[list[str], list[str]]] = {}
+    with os.scandir(path) as it:
+        entries = list(it)
+    for entry in entries:
+        if not entry.is_dir(follow_symlinks=False):
+            leaves.append(entry.name)
+        elif (child := _condenseDir(path / entry.name, False, plan, dry_run)) is not None:
+            children[entry.name] = child
+
+    match len(leaves), len(children):
+        case 0, 0:
+            if is_root:
+                return [], []
+            apply(path, None)
+            return None
+        case 0, 1:
+            # hoist the content of the only subdir up one level
+            # the subdir is already condensed so the result needs no further pass
+            name, (sub_leaves, sub_dirs) = children.popitem()
+            src = path / name
+            if name in sub_leaves or name in sub_dirs:
+                tmp = next(f"{name}.{i}" for i in itertools.count() if f"{name}.{i}" not in sub_leaves + sub_dirs)
+                apply(src, path / tmp)
+                src = path / tmp
+            for sub_name in sub_leaves + sub_dirs:
+                apply(src / sub_name, path / sub_name)
+            apply(src, None)
+            return sub_leaves, sub_dirs
+        case _:
+            return leaves, list(children)
+
+
+def condenseDirLayout(root: Path, dry_run: bool = False) -> list[tuple[Path, Optional[Path]]]:
     """
     Remove all dirs with no files recursively.
     Will also remove any intermediate dirs level with no files.
     Will not remove the input dir if empty.
+
+    The tree is condensed in a single post-order walk.
+    dry_run: bool: only plan the operations without touching the file system
+
+    return:list[tuple[Path, Optional[Path]]]: the operations in the order they are (or would be) executed,
+    a `(src, dst)` pair is a move and a `(dir, None)` pair is a removal of an empty dir
     """
     if not root.is_dir():
         raise NotADirectoryError(f'The input "{root}" is not a dir.')
-    for dir_path in listDir(root):
-        files = listFile(dir_path, rglob=False)
-        dirs = listDir(dir_path, rglob=False)
-        match len(files), len(dirs):
-            case 0, 0:
-                if root != dir_path:
-                    dir_path.rmdir()
-                    return condenseDirLayout(root)
-            case 0, 1:
-                subfiles = listFile(dir_path)
-                if not subfiles and root != dir_path:
-                    shutil.rmtree(dir_path, ignore_errors=False)
-                    return condenseDirLayout(root)
-                for subfile in subfiles:
-                    rel1 = dir_path.relative_to(root).parts
-                    rel2 = subfile.relative_to(dir_path).parts[1:]
-                    new_path = root.joinpath(*rel1, *rel2)
-                    if new_path.exists():
-                        raise FileExistsError(f'The new path "{new_path}" already exists.')
-                    new_path.parent.mkdir(parents=True, exist_ok=True)
-                    subfile.rename(new_path)
-                    if DEBUG:
-                        print(f'Moved "{subfile}" -> "{new_path}".')
-                return condenseDirLayout(root)
-            case _:
-                continue
-    return
+    plan: list[tuple[Path, Optional[Path]]] = []
+    _condenseDir(root, True, plan, dry_run)
+    return plan
+
+
+_FICLONE = 0x40049409  # _IOW(0x94, 9, int) in linux/fs.h
+_COPY_CHUNK = 64 * 2**20  # 64 MiB per kernel copy call or buffered read, also the progress granularity
+_VERIFY_CHUNK = 4 * 2**20  # 4 MiB per comparison of the existing content on resume
+
+
+def _reflink(src_fd: int, dst_fd: int) -> bool:
+    try:
+        import fcntl
+
+        fcntl.ioctl(dst_fd, _FICLONE, src_fd)
+        return True
+    except (ImportError, OSError):
+        return False
+
+
+def _copyRange(method: str, src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    match method:
+        case "copy_file_range":
+            return os.copy_file_range(src_fd, dst_fd, count, offset, offset)
+        case "sendfile":
+            os.lseek(dst_fd, offset, os.SEEK_SET)
+            return os.sendfile(dst_fd, src_fd, offset, count)
+        case _:
+            raise ValueError(f'Unknown copy method "{method}".')
+
+
+def _verifyPrefix(fi, fo, total: int) -> int:
+    "Return the size of the existing content of `fo` if all of it equals the beginning of `fi`, else 0."
+    size = os.fstat(fo.fileno()).st_size
+    if not 0 < size <= total:
+        return 0
+    fi.seek(0)
+    fo.seek(0)
+    for start in range(0, size, _VERIFY_CHUNK):
+        n = min(_VERIFY_CHUNK, size - start)
+        if fi.read(n) != fo.read(n):
+            return 0
+    return size
+
+
+def copyFile(
+    src: PathObj,
+    dst: PathObj,
+    progress: Optional[Callable[[int, int], Any]] = None,
+    resume: bool = False,
+) -> str:
+    """
+    Copy a file with its metadata like `shutil.copy2`, keeping the data in the kernel where possible.
+    The methods are tried in order: reflink (FICLONE), `os.copy_file_range`, `os.sendfile`, buffered read/write.
+    A method failing halfway hands over to the next one from where it stopped.
+
+    progress: Callable[[int, int], Any]: called with (copied bytes, total bytes) after each chunk
+    resume: bool: keep the existing content of `dst` if all of it equals the beginning of `src` and copy the rest only
+    the existing content is read in full to compare, which is still cheaper than writing it again
+
+    return:str: the name of the method finishing the copy
+    """
+    src = Path(src)
+    dst = Path(dst)
+    src_stat = src.stat()
+    total = src_stat.st_size
+    method = "buffered"
+    try:
+        dst_stat = dst.stat()
+    except OSError:
+        dst_stat = None
+    # opening dst for writing would truncate src if they are the same file, e.g. a hardlink
+    if dst_stat and (dst_stat.st_dev, dst_stat.st_ino) == (src_stat.st_dev, src_stat.st_ino):
+        raise shutil.SameFileError(f'"{src}" and "{dst}" are the same file.')
+
+    with src.open("rb") as fi, dst.open("r+b" if resume and dst.is_file() else "wb") as fo:
+        offset = _verifyPrefix(fi, fo, total) if resume else 0
+        fo.truncate(offset)
+        if progress and offset:
+            progress(offset, total)
+
+        src_fd, dst_fd = fi.fileno(), fo.fileno()
+        if sys.platform == "linux" and offset == 0 < total and _reflink(src_fd, dst_fd):
+            offset = total
+            method = "reflink"
+            if progress:
+                progress(offset, total)
+
+        for kernel_method in ("copy_file_range", "sendfile") if sys.platform == "linux" else ():
+            if offset >= total:
+                break
+            try:
+                while offset < total:
+                    if not (n := _copyRange(kernel_method, src_fd, dst_fd, offset, min(_COPY_CHUNK, total - offset))):
+                        break
+                    offset += n
+                    if progress:
+                        progress(offset, total)
+            except OSError:
+                pass
+            if offset >= total:
+                method = kernel_method
+
+        # also pick up anything appended to the source during the copy
+        fi.seek(offset)
+        fo.seek(offset)
+        buffer = bytearray(min(_COPY_CHUNK, max(total - offset, 1)))
+        view = memoryview(buffer)
+        while n := fi.readinto(buffer):
+            fo.write(view[:n])
+            offset += n
+            if progress:
+                progress(offset, total)
+
+    shutil.copystat(src, dst)
+    return method
 
 
 def tryMkDir(path: PathObj, parents: bool = True, exist_ok: bool = True) -> bool:
@@ -240,7 +555,7 @@ def tryCopy(src: PathObj, dst: Union[str, Path]) -> bool:
 
     try:
         dst.parent.mkdir(parents=True, exist_ok=True)
-        shutil.copy2(src, dst)
+        copyFile(src, dst)
         return True
     except:
         if remove_dst:
@@ -263,7 +578,7 @@ def tryHardlinkThenCopy(src: PathObj, dst: PathObj) -> bool:
     try:
         dst.parent.mkdir(parents=True, exist_ok=True)
         if not tryHardlink(src, dst):
-            shutil.copy2(src, dst)
+            copyFile(src, dst)
         return True
     except:
         if remove_dst:
@@ -271,6 +586,72 @@ def tryHardlinkThenCopy(src: PathObj, dst: PathObj) -> bool:
         return False
 
 
+# the errnos telling that hardlink is not possible between two devices at all, rather than a per-file failure
+# EPERM is not one of them as on Linux it is also raised per file by `fs.protected_hardlinks` (another owner)
+_NO_HARDLINK_ERRNOS = frozenset({errno.EXDEV, errno.ENOTSUP, errno.EOPNOTSUPP, errno.ENOSYS})
+
+
+def _copyNew(src: Path, dst: Path) -> bool:
+    try:
+        copyFile(src, dst)
+        return True
+    except:
+        dst.unlink(missing_ok=True)
+        return False
+
+
+def tryHardlinkThenCopyBatch(pairs: Iterable[tuple[PathObj, PathObj]], workers: int = 4) -> list[str]:
+    """
+    The batch version of `tryHardlinkThenCopy`, which never raises for a single bad pair.
+    A target given more than once is only made for its first pair, the later ones fail.
+    Hardlink support is learnt once per (source device, target device) and remembered,
+    each target dir is created once, and the copies run in a thread pool of `workers` threads.
+
+    return:list[str]: "hardlink", "copy" or "" (failed) for each input pair in order
+    """
+    pairs = [(Path(src), Path(dst)) for src, dst in pairs]
+    ret = [""] * len(pairs)
+    can_link: dict[tuple[int, int], bool] = {}
+    dir_devs: dict[Path, Optional[int]] = {}
+    taken: set[str] = set()  # the targets of the earlier pairs, as the copies only run after this loop
+    copies: list[int] = []
+
+    for i, (src, dst) in enumerate(pairs):
+        try:
+            src_stat = src.stat()
+        except OSError:
+            continue
+        if not stat.S_ISREG(src_stat.st_mode):
+            continue
+        if dst.parent not in dir_devs:
+            try:
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                dir_devs[dst.parent] = dst.parent.stat().st_dev
+            except OSError:
+                dir_devs[dst.parent] = None
+        if (dst_dev := dir_devs[dst.parent]) is None or os.path.lexists(dst):
+            continue
+        if (target := os.path.normcase(os.path.abspath(dst))) in taken:
+            continue
+        taken.add(target)
+        if can_link.get(key := (src_stat.st_dev, dst_dev), True):
+            try:
+                os.link(src, dst)
+                can_link[key] = True
+                ret[i] = "hardlink"
+                continue
+            except OSError as e:
+                if e.errno in _NO_HARDLINK_ERRNOS:
+                    can_link[key] = False
+        copies.append(i)
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        results = pool.map(_copyNew, (pairs[i][0] for i in copies), (pairs[i][1] for i in copies))
+        for i, ok in zip(copies, results):
+            ret[i] = "copy" if ok else ""
+    return ret
+
+
 def tryHardlink(existing: PathObj, proposed: PathObj) -> bool:
     """Similar to `tstMkHardlink` but will keep the artifacts."""
 
@@ -332,17 +713,20 @@ def tstMkHardlink(existing: PathObj, proposed: PathObj) -> bool:
 
 
 def tstMkHardlinks(existings: list[Path], proposed: Path, use_st_dev: bool = True) -> bool:
-    src_dev = None
+    """
+    Test `tstMkHardlink` for each of `existings`.
+    With `use_st_dev`, only the first file of each source device is actually tested.
+    """
+    tested_devs: set[int] = set()
     for existing in existings:
         if not existing.is_file():
             raise FileNotFoundError
-        if use_st_dev and (new_src_dev := existing.stat().st_dev) != src_dev:
-            src_dev = new_src_dev
-            if not tstMkHardlink(existing, proposed):
-                return False
-        else:
-            if not tstMkHardlink(existing, proposed):
-                return False
+        if use_st_dev:
+            if (src_dev := existing.stat().st_dev) in tested_devs:
+                continue
+            tested_devs.add(src_dev)
+        if not tstMkHardlink(existing, proposed):
+            return False
     return True
 
 
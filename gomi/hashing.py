@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-__all__ = ["toSHA1", "toCRC32"]
+__all__ = ["toSHA1", "toCRC32", "combineCRC32"]
 
 import sys
 
@@ -32,3 +32,46 @@ def toCRC32(bchars: Union[str, bytes], encoding: str = "utf-8") -> str:
         return toCRC32(bchars.encode(encoding))
     else:
         raise TypeError(f'Unexpected type "{type(bchars)}".')
+
+
+_CRC32_POLY = 0xEDB88320  # the reflected CRC-32 polynomial used by zlib
+
+
+def _multModP(a: int, b: int) -> int:
+    "Multiply a(x) by b(x) modulo the CRC-32 polynomial, in the reflected bit order of zlib."
+    m = 1 << 31
+    p = 0
+    while True:
+        if a & m:
+            p ^= b
+            if not a & (m - 1):
+                return p
+        m >>= 1
+        b = (b >> 1) ^ _CRC32_POLY if b & 1 else b >> 1
+
+
+def _mkX2NTable() -> list[int]:
+    table, p = [], 1 << 30  # x^1
+    for _ in range(32):
+        table.append(p)
+        p = _multModP(p, p)
+    return table
+
+
+_X2N_TABLE = _mkX2NTable()  # x^(2^n) mod p(x) for n in [0, 32)
+
+
+def combineCRC32(crc1: int, crc2: int, len2: int) -> int:
+    """
+    Return the CRC32 of the concatenation A+B from crc1 = CRC32(A), crc2 = CRC32(B) and len2 = len(B),
+    i.e. `crc32_combine` of zlib, which the Python binding does not expose.
+    The cost is O(log(len2)) regardless of the data size.
+    """
+    # crc1 * x^(8 * len2) mod p(x), see zlib's x2nmodp()
+    p, n, k = 1 << 31, len2, 3
+    while n:
+        if n & 1:
+            p = _multModP(_X2N_TABLE[k & 31], p)
+        n >>= 1
+        k += 1
+    return _multModP(p, crc1) ^ crc2
@@ -0,0 +1,213 @@
+"""This module provides .sfv and sha1sum-style checksum manifests of file trees."""
+
+from __future__ import annotations
+
+__all__ = ["writeManifest", "readManifest", "verifyManifest"]
+
+import sys  # fmt: skip
+if sys.version_info < (3, 10):
+    raise RuntimeError("This module requires Python 3.10.")
+
+import os
+import sqlite3
+import warnings
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Sequence, Union
+
+from .fs import listFile
+from .file import getFileCRC32, getFileSHA1, _isSSD
+from .__utils import PathObj
+
+
+_ALGOS = {".sfv": "crc32", ".sha1": "sha1", ".sha1sum": "sha1"}
+
+
+def _getAlgo(manifest_path: Path) -> str:
+    if (algo := _ALGOS.get(manifest_path.suffix.lower())) is None:
+        raise ValueError(f'Unknown manifest type "{manifest_path.suffix}", expected .sfv, .sha1 or .sha1sum.')
+    return algo
+
+
+_HASH_FUNCS: dict[str, Callable[..., str]] = {"crc32": getFileCRC32, "sha1": getFileSHA1}
+_ESCAPES = {"\\": "\\\\", "\n": "\\n", "\r": "\\r"}
+_UNESCAPES = {"\\": "\\", "n": "\n", "r": "\r"}
+
+
+def _escape(name: str) -> tuple[str, str]:
+    "GNU coreutils escaping of the names with a backslash or a line break, returning (line prefix, escaped name)."
+    if not any(c in name for c in _ESCAPES):
+        return "", name
+    return "\\", "".join(_ESCAPES.get(c, c) for c in name)
+
+
+def _unescape(name: str) -> str:
+    ret: list[str] = []
+    chars = iter(name)
+    for c in chars:
+        if c == "\\":
+            c += next(chars, "")
+            c = _UNESCAPES.get(c[1:], c)
+        ret.append(c)
+    return "".join(ret)
+
+
+def _isSFVName(name: str) -> bool:
+    "A .sfv line has no escaping, `\\` is read as a separator, and the name is split from the CRC by a space."
+    return not any(c in name for c in "\\\n\r") and not name.startswith(";") and name == name.rstrip()
+
+
+def readManifest(manifest_path: PathObj) -> list[tuple[str, str]]:
+    """
+    Parse a .sfv or a sha1sum-style manifest, the type being told by its suffix.
+    The names of a .sfv are accepted with both `/` and `\\` separators.
+
+    return:list[tuple[str, str]]: the (posix name relative to the manifest dir, lower-cased hash) of each entry
+    """
+    manifest_path = Path(manifest_path)
+    algo = _getAlgo(manifest_path)
+    ret: list[tuple[str, str]] = []
+    #! not `splitlines()`, which also breaks at the \v, \f, \x1c-\x1e and \u2028 allowed in a name
+    with manifest_path.open(encoding="utf-8-sig", newline="") as fo:
+        text = fo.read()
+    for i, line in enumerate(text.split("\n"), 1):
+        line = line.removesuffix("\r")
+        if not line.strip() or (algo == "crc32" and line.startswith(";")):
+            continue
+        if algo == "crc32":
+            name, _, hash = line.rstrip().rpartition(" ")
+            name = name.rstrip().replace("\\", "/")
+            size = 8
+        else:
+            escaped = line.startswith("\\")
+            hash, _, name = line.removeprefix("\\").partition(" ")
+            if name[:1] in (" ", "*"):  # the text/binary mode flag, absent in the single space form
+                name = name[1:]
+            name = _unescape(name) if escaped else name
+            size = 40
+        if not name or len(hash) != size or not all(c in "0123456789abcdefABCDEF" for c in hash):
+            raise ValueError(f'Invalid line {i} in "{manifest_path}": {line}')
+        ret.append((name, hash.lower()))
+    return ret
+
+
+def writeManifest(
+    manifest_path: PathObj,
+    root: Optional[PathObj] = None,
+    ext: Optional[Union[str, Sequence[str]]] = None,
+    workers: int = 8,
+) -> list[tuple[str, str]]:
+    """
+    Hash all the files under `root` in a thread pool and write a .sfv or a sha1sum-style manifest,
+    the type being told by the suffix of `manifest_path` (.sfv, .sha1 or .sha1sum).
+    The entries are in `fs.listFile` order and named in posix style relative to the manifest dir.
+    All the manifests (.sfv, .sha1 and .sha1sum) are skipped, and so are the names a .sfv cannot represent
+    (with a `\\`, a line break, a leading `;` or trailing spaces) with a warning.
+
+    root: Optional[PathObj]: the dir to hash, default to the manifest dir
+
+    return:list[tuple[str, str]]: the written (name, hash) entries
+    """
+    manifest_path = Path(manifest_path)
+    algo = _getAlgo(manifest_path)
+    base = manifest_path.parent
+    files: list[Path] = []
+    for p in listFile(base if root is None else root, ext=ext):
+        if p.suffix.lower() in _ALGOS:
+            continue
+        if algo == "crc32" and not _isSFVName(Path(os.path.relpath(p, base)).as_posix()):
+            warnings.warn(f'Skipping "{p}" as its name cannot be represented in a .sfv.')
+            continue
+        files.append(p)
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        hashes = list(pool.map(_HASH_FUNCS[algo], files))
+    entries = [(Path(os.path.relpath(p, base)).as_posix(), hash) for p, hash in zip(files, hashes)]
+
+    lines: list[str] = []
+    for name, hash in entries:
+        if algo == "crc32":
+            lines.append(f"{name} {hash.upper()}")
+        else:
+            prefix, name = _escape(name)
+            lines.append(f"{prefix}{hash}  {name}")
+    manifest_path.write_text("".join(f"{line}\n" for line in lines), encoding="utf-8", newline="\n")
+    return entries
+
+
+_PROGRESS_SCHEMA = """
+PRAGMA journal_mode = WAL;
+PRAGMA synchronous = NORMAL;
+CREATE TABLE IF NOT EXISTS progress (
+    manifest TEXT NOT NULL,
+    name TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    ok INTEGER NOT NULL,
+    PRIMARY KEY (manifest, name)
+) WITHOUT ROWID;
+"""
+
+
+def verifyManifest(
+    manifest_path: PathObj,
+    workers: int = 8,
+    progress: Optional[PathObj] = None,
+) -> Iterator[tuple[Path, Optional[bool]]]:
+    """
+    Verify the files listed in a .sfv or a sha1sum-style manifest and stream the results as they complete.
+    The files are grouped by their device, each SSD gets a pool of `workers` threads
+    while each HDD gets a single sequential reader, as `file.hashFiles`.
+
+    progress: Optional[PathObj]: a SQLite file recording each checked file with its size and mtime
+    an interrupted run given the same file resumes, i.e. the unchanged files checked before are not read again
+    and their recorded results are yielded first
+
+    return:Iterator[tuple[Path, Optional[bool]]]: (path, True if matched, False if not, None if missing/unreadable)
+    """
+    manifest_path = Path(manifest_path)
+    func = _HASH_FUNCS[_getAlgo(manifest_path)]
+    entries = readManifest(manifest_path)
+    key = str(manifest_path.resolve())
+
+    conn = sqlite3.connect(Path(progress), isolation_level=None) if progress else None
+    done: dict[str, tuple[str, int, int, bool]] = {}
+    if conn:
+        conn.executescript(_PROGRESS_SCHEMA)
+        rows = conn.execute("SELECT name, hash, size, mtime_ns, ok FROM progress WHERE manifest = ?", (key,))
+        done = {name: (hash, size, mtime_ns, bool(ok)) for name, hash, size, mtime_ns, ok in rows}
+
+    pools: dict[Optional[int], ThreadPoolExecutor] = {}
+    futures: dict[Future, tuple[str, str, Path, os.stat_result]] = {}
+    try:
+        for name, hash in entries:
+            path = manifest_path.parent / name
+            try:
+                st = path.stat()
+            except OSError:
+                yield path, None
+                continue
+            if (record := done.get(name)) and record[:3] == (hash, st.st_size, st.st_mtime_ns):
+                yield path, record[3]
+                continue
+            if st.st_dev not in pools:
+                pools[st.st_dev] = ThreadPoolExecutor(max_workers=max(workers, 1) if _isSSD(path) else 1)
+            futures[pools[st.st_dev].submit(func, path, pass_error=True)] = (name, hash, path, st)
+
+        for future in as_completed(futures):
+            name, hash, path, st = futures.pop(future)
+            if not (actual := future.result()):
+                yield path, None
+                continue
+            ok = actual == hash
+            if conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO progress VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, name, hash, st.st_size, st.st_mtime_ns, ok),
+                )
+            yield path, ok
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        if conn:
+            conn.close()
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import io
 import re
 from pathlib import Path
 
@@ -19,9 +20,9 @@ def tstAssFile(path: Path, encoding="utf-8-sig"):
         if not tstFileEncoding(path, encoding=encoding):
             return False
         # NOTE use 2 existing ass libs to verify
-        read_ass(path.read_text(encoding=encoding))
-        with path.open("r", encoding=encoding) as fo:
-            ass.parse(fo)
+        text = path.read_text(encoding=encoding)
+        read_ass(text)
+        ass.parse(io.StringIO(text))
         return True
     except:
         return False
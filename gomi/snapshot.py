@@ -0,0 +1,172 @@
+"""This module provides a persistent dir listing index to speed up repeated `listFile` calls on a large tree."""
+
+from __future__ import annotations
+
+__all__ = ["DirSnapshot"]
+
+import sys  # fmt: skip
+if sys.version_info < (3, 10):
+    raise RuntimeError("This module requires Python 3.10.")
+
+import os
+import time
+import sqlite3
+from pathlib import Path
+from typing import Iterator, Optional, Sequence, Union
+
+from .__utils import PathObj
+from .fs import _suffix
+
+
+# the paths and names are stored as `os.fsencode` BLOBs, as a non UTF-8 name (e.g. Shift-JIS from an archive)
+# comes from `os.scandir` as a surrogate-escaped str that SQLite cannot store as TEXT
+_SCHEMA_VERSION = 1
+_SCHEMA = """
+DROP TABLE IF EXISTS dirs;
+DROP TABLE IF EXISTS entries;
+CREATE TABLE dirs (path BLOB PRIMARY KEY, mtime_ns INTEGER NOT NULL) WITHOUT ROWID;
+CREATE TABLE entries (
+    dir BLOB NOT NULL,
+    pos INTEGER NOT NULL,
+    name BLOB NOT NULL,
+    kind INTEGER NOT NULL,
+    PRIMARY KEY (dir, pos)
+) WITHOUT ROWID;
+"""
+
+_IS_FILE = 1
+_IS_DIR = 2
+_DESCEND = 4  # a real dir, not a symlink to a dir
+
+# a dir modified this close to the scan may be modified again within the same mtime tick
+# so its listing is stored but not trusted on the next scan
+_RACY_NS = 2 * 10**9
+
+
+class DirSnapshot:
+    """
+    A dir listing index stored in SQLite, keyed by the absolute path and mtime of each dir.
+    On a rescan only the dirs whose mtime changed are enumerated again, the others cost one stat.
+    The results are identical to `fs.listFile`/`fs.listDir` as long as the type of an entry is not
+    replaced in place without touching its parent (e.g. retargeting a symlink).
+
+    with DirSnapshot("library.sqlite") as snap:
+        files = snap.listFile("/mnt/library", ext=".mkv")
+    """
+
+    def __init__(self, db_path: PathObj):
+        self.__conn = sqlite3.connect(Path(db_path))
+        if self.__conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+            self.__conn.executescript(_SCHEMA + f"PRAGMA user_version = {_SCHEMA_VERSION};")
+
+    def __enter__(self) -> DirSnapshot:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.__conn.close()
+
+    def __readDir(self, path: str) -> list[tuple[str, int]]:
+        path = os.path.abspath(path)
+        key = os.fsencode(path)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return []
+        row = self.__conn.execute("SELECT mtime_ns FROM dirs WHERE path = ?", (key,)).fetchone()
+        if row and row[0] == mtime_ns:
+            rows = self.__conn.execute("SELECT name, kind FROM entries WHERE dir = ? ORDER BY pos", (key,))
+            return [(os.fsdecode(name), kind) for name, kind in rows]
+
+        try:
+            with os.scandir(path) as it:
+                children = []
+                for entry in it:
+                    if entry.is_dir():
+                        children.append((entry.name, _IS_DIR | (0 if entry.is_symlink() else _DESCEND)))
+                    else:
+                        children.append((entry.name, _IS_FILE if entry.is_file() else 0))
+        except PermissionError:
+            return []
+
+        if row:
+            names = {os.fsencode(name) for name, _ in children}
+            old = self.__conn.execute("SELECT name, kind FROM entries WHERE dir = ?", (key,)).fetchall()
+            for name, kind in old:
+                if kind & _DESCEND and name not in names:
+                    self.__forget(os.path.join(key, name))
+            self.__conn.execute("DELETE FROM entries WHERE dir = ?", (key,))
+        if time.time_ns() - mtime_ns < _RACY_NS:
+            mtime_ns = -1
+        self.__conn.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?)", (key, mtime_ns))
+        rows = ((key, i, os.fsencode(name), kind) for i, (name, kind) in enumerate(children))
+        self.__conn.executemany("INSERT INTO entries VALUES (?, ?, ?, ?)", rows)
+        return children
+
+    def __forget(self, key: bytes):
+        "Drop a removed dir and everything indexed under it."
+        lo = key + os.sep.encode()
+        hi = lo[:-1] + bytes([lo[-1] + 1])  # the BLOBs are compared bytewise, so this bounds all with prefix `lo`
+        for table, col in (("dirs", "path"), ("entries", "dir")):
+            self.__conn.execute(f"DELETE FROM {table} WHERE {col} = ? OR ({col} >= ? AND {col} < ?)", (key, lo, hi))
+
+    def __scan(self, root: str, rglob: bool) -> Iterator[tuple[str, int]]:
+        # same pre-order as `fs._scanDir`
+        stack = [root]
+        while stack:
+            cur = stack.pop()
+            subdirs: list[str] = []
+            for name, kind in self.__readDir(cur):
+                path = os.path.join(cur, name)
+                yield path, kind
+                if rglob and kind & _DESCEND:
+                    subdirs.append(path)
+            stack.extend(reversed(subdirs))
+
+    def listFile(
+        self,
+        *paths,
+        ext: Optional[Union[str, Sequence[str]]] = None,
+        rglob: bool = True,
+        reduce: bool = True,
+        sort: bool = True,
+    ) -> list[Path]:
+        "Same as `fs.listFile` but served from the index where possible."
+        exts = ((ext,) if isinstance(ext, str) else tuple(ext)) if ext else None
+        ret: list[Path] = []
+        with self.__conn:
+            for p in paths:
+                p = Path(Path(p).as_posix())
+                if p.is_file():
+                    if not exts or p.suffix.lower().endswith(exts):
+                        ret.append(p)
+                    continue
+                if p.is_dir():
+                    for path, kind in self.__scan(str(p), rglob):
+                        if kind & _IS_FILE and (not exts or _suffix(os.path.basename(path)).lower().endswith(exts)):
+                            ret.append(Path(path))
+        if reduce:
+            ret = list(dict.fromkeys(ret))
+        return sorted(ret) if sort else ret
+
+    def listDir(
+        self,
+        *paths,
+        rglob: bool = True,
+        reduce: bool = True,
+        sort: bool = True,
+    ) -> list[Path]:
+        "Same as `fs.listDir` but served from the index where possible."
+        ret: list[Path] = []
+        with self.__conn:
+            for p in paths:
+                p = Path(Path(p).as_posix())
+                if p.is_dir():
+                    if rglob:
+                        ret.append(p)
+                    ret += [Path(path) for path, kind in self.__scan(str(p), rglob) if kind & _IS_DIR]
+        if reduce:
+            ret = list(dict.fromkeys(ret))
+        return sorted(ret) if sort else ret
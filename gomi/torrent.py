@@ -0,0 +1,440 @@
+"""This module provides BitTorrent v1 info-hashing, verification, creation and indexing on top of `bencoding`."""
+
+from __future__ import annotations
+
+__all__ = ["infoHash", "infoHashes", "verifyTorrent", "makeTorrent", "TorrentIndex"]
+
+import sys  # fmt: skip
+if sys.version_info < (3, 10):
+    raise RuntimeError("This module requires Python 3.10.")
+
+import os
+import mmap
+import time
+import sqlite3
+import hashlib
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Sequence, Union
+
+from .fs import listFile
+from .bencoding import bdecode, bencodeTo, _bdecode, _skip, _DICT, _END, _ENCODING
+from .__utils import PathObj
+
+
+def _getInfoSpan(buf: bytes | mmap.mmap) -> tuple[int, int]:
+    "The (start, end) offsets of the raw `info` value in a bencoded torrent, only the top level is parsed."
+    try:
+        if buf[0] == _DICT:
+            pos = 1
+            while buf[pos] != _END:
+                key, pos = _bdecode(buf, pos)
+                end = _skip(buf, pos)
+                if key == b"info" and buf[pos] == _DICT:
+                    return pos, end
+                pos = end
+    except IndexError:
+        raise ValueError("Bdecode hits truncated content.") from None
+    except RecursionError:
+        raise ValueError("Bdecode hits too deeply nested content.") from None
+    raise ValueError("The content is not a torrent with an info dict.")
+
+
+def infoHash(src: Union[PathObj, bytes]) -> str:
+    """
+    Return the BitTorrent v1 info-hash (hex SHA1) of a .torrent file or its content.
+    The exact bytes of the `info` value are hashed as they are stored, without decoding and re-encoding it,
+    so the result is right even if the torrent is not canonically encoded (e.g. unsorted keys).
+    """
+    if isinstance(src, bytes):
+        start, end = _getInfoSpan(src)
+        with memoryview(src) as view, view[start:end] as info:
+            return hashlib.sha1(info).hexdigest()
+    with Path(src).open("rb") as fo:
+        if not os.fstat(fo.fileno()).st_size:
+            raise ValueError(f'"{src}" is empty.')
+        with mmap.mmap(fo.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start, end = _getInfoSpan(mm)
+            with memoryview(mm) as view, view[start:end] as info:
+                return hashlib.sha1(info).hexdigest()
+
+
+def _tryInfoHash(src: PathObj) -> str:
+    try:
+        return infoHash(src)
+    except (OSError, ValueError):
+        return ""
+
+
+def infoHashes(paths: Iterable[PathObj], workers: int = 8) -> list[str]:
+    """
+    Batch `infoHash` over many .torrent files in a thread pool.
+
+    return:list[str]: the info-hash of each file in the input order, "" for an unreadable or invalid one
+    """
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        return list(pool.map(_tryInfoHash, paths))
+
+
+def _getParts(d: dict, key: bytes) -> list[str]:
+    "Prefer the `key.utf-8` variant of old clients, and never fail on a legacy code page."
+    val = d.get(key + b".utf-8", d.get(key, b""))
+    parts = val if isinstance(val, list) else [val]
+    return [part.decode(_ENCODING, "replace") for part in parts if isinstance(part, bytes)]
+
+
+def _getText(d: dict, key: bytes) -> str:
+    return "/".join(_getParts(d, key))
+
+
+def _loadTorrent(torrent_path: PathObj) -> dict:
+    "Return the raw `bdecode` result, only the names and paths are decoded on use as other fields may be binary."
+    torrent = bdecode(Path(torrent_path).read_bytes())
+    if not isinstance(torrent, dict) or not isinstance(torrent.get(b"info"), dict):
+        raise ValueError(f'"{torrent_path}" is not a valid torrent file.')
+    return torrent
+
+
+def _listPayload(info: dict, content_root: Path) -> list[tuple[Path, int, bool]]:
+    "Return the (path, length, is padding) of each file in the payload order."
+    root = content_root / _getText(info, b"name")
+    if b"files" not in info:
+        return [(root, info[b"length"], False)]
+    # BEP 47 padding files are virtual zeros never stored on the disk
+    return [(root.joinpath(*_getParts(f, b"path")), f[b"length"], b"p" in f.get(b"attr", b"")) for f in info[b"files"]]
+
+
+def _iterPieces(
+    files: list[tuple[Path, int, bool]], piece_length: int, strict: bool = False
+) -> Iterator[tuple[bytearray, list[int], list[int]]]:
+    """
+    Stream the concatenated payload in pieces.
+    Yield (piece data, indices of the files it covers, indices of the missing files among them) for each piece.
+    Data of missing files and past the end of short files is read as zeros, unless `strict` where it raises.
+    """
+    piece, pos = bytearray(piece_length), 0
+    covered: list[int] = []
+    missing: list[int] = []
+    for i, (path, length, is_pad) in enumerate(files):
+        fo = None
+        if not is_pad:
+            try:
+                fo = path.open("rb")
+            except OSError:
+                pass
+        try:
+            while length:
+                n = min(length, piece_length - pos)
+                got = fo.readinto(memoryview(piece)[pos : pos + n]) if fo else 0
+                if strict and fo and got < n:
+                    raise RuntimeError(f'"{path}" is shorter than its expected length {files[i][1]}.')
+                piece[pos + got : pos + n] = bytes(n - got)
+                if not is_pad:
+                    covered.append(i)
+                    if not fo:
+                        missing.append(i)
+                pos += n
+                length -= n
+                if pos == piece_length:
+                    yield piece, covered, missing
+                    piece, pos = bytearray(piece_length), 0
+                    covered, missing = [], []
+        finally:
+            if fo:
+                fo.close()
+    if pos:
+        yield piece[:pos], covered, missing
+
+
+def _tstPiece(data: bytearray, digest: bytes) -> bool:
+    return hashlib.sha1(data).digest() == digest
+
+
+def verifyTorrent(torrent_path: PathObj, content_root: PathObj, workers: Optional[int] = None) -> dict:
+    """
+    Verify the local content of a BitTorrent v1 torrent against its SHA1 piece hashes.
+    The payload is read once sequentially while the pieces are hashed by a thread pool,
+    with at most `2 * workers` pieces in memory.
+
+    content_root: PathObj: the dir the content is saved into, i.e. the parent of the torrent `name`
+    workers: Optional[int]: the number of hashing threads, default to `os.cpu_count()`
+
+    return:dict: {
+        "pieces": list[bool], whether each piece is verified,
+        "missing": dict[Path, list[int]], the missing files and the pieces they prevent from verifying,
+        "corrupt": dict[Path, list[int]], the existing files covered by failed pieces and those pieces,
+    }
+    """
+    info = _loadTorrent(torrent_path)[b"info"]
+    files = _listPayload(info, Path(content_root))
+    piece_length: int = info[b"piece length"]
+    digests: bytes = info[b"pieces"]
+    total = sum(length for _, length, _ in files)
+    if len(digests) != 20 * -(-total // piece_length):
+        raise ValueError(f'The piece count of "{torrent_path}" does not match its payload size.')
+
+    ret: dict = {"pieces": [], "missing": {}, "corrupt": {}}
+    for path, length, is_pad in files:
+        if not is_pad and not path.is_file():
+            ret["missing"][path] = []
+
+    def collect(future: Optional[Future], covered: list[int], missing: list[int]):
+        index = len(ret["pieces"])
+        ret["pieces"].append(ok := future is not None and future.result())
+        if ok:
+            return
+        for i in missing:
+            ret["missing"].setdefault(files[i][0], []).append(index)
+        for i in covered if not missing else ():
+            ret["corrupt"].setdefault(files[i][0], []).append(index)
+
+    workers = workers or os.cpu_count() or 1
+    pending: deque[tuple[Optional[Future], list[int], list[int]]] = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for i, (piece, covered, missing) in enumerate(_iterPieces(files, piece_length)):
+            # a piece with missing data fails anyway, no need to hash it
+            future = None if missing else pool.submit(_tstPiece, piece, digests[20 * i : 20 * i + 20])
+            pending.append((future, covered, missing))
+            while len(pending) >= 2 * workers:
+                collect(*pending.popleft())
+        while pending:
+            collect(*pending.popleft())
+    return ret
+
+
+_MIN_PIECE_LENGTH = 2**14  # 16 KiB
+_MAX_PIECE_LENGTH = 2**24  # 16 MiB
+_TARGET_PIECES = 1500
+
+
+def _proposePieceLength(total: int) -> int:
+    "The power of 2 closest above `total / _TARGET_PIECES`, clamped to [16 KiB, 16 MiB]."
+    length = 1 << max(-(-total // _TARGET_PIECES) - 1, 0).bit_length()
+    return min(max(length, _MIN_PIECE_LENGTH), _MAX_PIECE_LENGTH)
+
+
+def _hashPiece(data: bytearray) -> bytes:
+    return hashlib.sha1(data).digest()
+
+
+def makeTorrent(
+    src: PathObj,
+    dst: Optional[PathObj] = None,
+    announce: Union[str, Sequence[str]] = (),
+    piece_length: int = 0,
+    private: bool = False,
+    comment: str = "",
+    workers: Optional[int] = None,
+) -> dict:
+    """
+    Create a BitTorrent v1 torrent of a file or a dir, with the pieces hashed by a thread pool.
+    The payload is read once sequentially with at most `2 * workers` pieces in memory,
+    and the digests are collected in order so the result is identical to a serial hashing.
+
+    dst: Optional[PathObj]: where to write the .torrent file, not written if None
+    announce: Union[str, Sequence[str]]: a tracker url or the urls, the first one is also used as the main `announce`
+    piece_length: int: the piece length in bytes, <=0 means auto (about 1500 pieces, 16 KiB to 16 MiB)
+    workers: Optional[int]: the number of hashing threads, default to `os.cpu_count()`
+
+    return:dict: the torrent dict as written by `bencodeTo` with sorted keys
+    """
+    src = Path(src)
+    announce = (announce,) if isinstance(announce, str) else tuple(announce)  #! a str is also a Sequence[str]
+    if src.is_file():
+        entries = [(src, src.stat().st_size)]
+    elif src.is_dir():
+        entries = [(p, p.stat().st_size) for p in listFile(src)]
+    else:
+        raise FileNotFoundError(f'The source location "{src}" does not exist.')
+    total = sum(length for _, length in entries)
+    piece_length = piece_length if piece_length > 0 else _proposePieceLength(total)
+
+    workers = workers or os.cpu_count() or 1
+    digests: list[bytes] = []
+    pending: deque[Future] = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for piece, _, missing in _iterPieces([(p, length, False) for p, length in entries], piece_length, True):
+            if missing:
+                raise FileNotFoundError(f'Failed to read "{entries[missing[0]][0]}".')
+            pending.append(pool.submit(_hashPiece, piece))
+            while len(pending) >= 2 * workers:
+                digests.append(pending.popleft().result())
+        digests += [future.result() for future in pending]
+
+    info: dict = {}
+    if src.is_dir():
+        info["files"] = [{"length": length, "path": list(p.relative_to(src).parts)} for p, length in entries]
+    else:
+        info["length"] = total
+    info["name"] = src.name
+    info["piece length"] = piece_length
+    info["pieces"] = b"".join(digests)
+    if private:
+        info["private"] = 1
+
+    torrent: dict = {}
+    if announce:
+        torrent["announce"] = announce[0]
+    if len(announce) > 1:
+        torrent["announce-list"] = [[url] for url in announce]
+    if comment:
+        torrent["comment"] = comment
+    torrent["creation date"] = int(time.time())
+    torrent["info"] = info
+
+    if dst:
+        with Path(dst).open("wb") as fo:
+            bencodeTo(torrent, fo, sort_keys=True)
+    return torrent
+
+
+# the torrent paths are stored as `os.fsencode` BLOBs, as a non UTF-8 name is a surrogate-escaped str
+# that SQLite cannot store as TEXT, see `snapshot.DirSnapshot`
+_INDEX_SCHEMA_VERSION = 1
+_INDEX_SCHEMA = """
+DROP TABLE IF EXISTS torrents;
+DROP TABLE IF EXISTS files;
+CREATE TABLE torrents (
+    path BLOB PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    info_hash TEXT NOT NULL,
+    name TEXT NOT NULL,
+    total_size INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE files (
+    torrent BLOB NOT NULL,
+    pos INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    PRIMARY KEY (torrent, pos)
+) WITHOUT ROWID;
+CREATE INDEX torrents_info_hash ON torrents (info_hash);
+CREATE INDEX files_length ON files (length);
+"""
+
+
+def _parseTorrent(path: str) -> Optional[tuple[str, str, int, list[tuple[str, int]]]]:
+    "Return (info-hash, name, total size, [(file path, length), ...]) of a torrent, None if invalid."
+    try:
+        data = Path(path).read_bytes()
+        info = bdecode(data)[b"info"]
+        name = _getText(info, b"name")
+        if b"files" in info:
+            files = [(_getText(f, b"path"), f[b"length"]) for f in info[b"files"] if b"p" not in f.get(b"attr", b"")]
+        else:
+            files = [(name, info[b"length"])]
+        return infoHash(data), name, sum(length for _, length in files), files
+    except (OSError, ValueError, KeyError, TypeError, AttributeError, RecursionError):
+        return None
+
+
+class TorrentIndex:
+    """
+    A SQLite index of a .torrent library: the info-hash, name, total size and file list of each torrent.
+    `update` only parses the torrents added or modified since the last call, in a process pool.
+    The file lengths are indexed, so finding the torrents with a file of an exact size is a single B-tree lookup.
+
+    with TorrentIndex("torrents.sqlite") as index:
+        index.update("/mnt/torrents")
+        for torrent, file in index.findBySize(1_234_567_890):
+            ...
+
+    NOTE as a process pool is used, call `update` under `if __name__ == "__main__":` on Windows/macOS
+    """
+
+    def __init__(self, db_path: PathObj):
+        self.__conn = sqlite3.connect(Path(db_path))
+        if self.__conn.execute("PRAGMA user_version").fetchone()[0] != _INDEX_SCHEMA_VERSION:
+            self.__conn.executescript(_INDEX_SCHEMA + f"PRAGMA user_version = {_INDEX_SCHEMA_VERSION};")
+
+    def __enter__(self) -> TorrentIndex:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.__conn.close()
+
+    def __len__(self) -> int:
+        return self.__conn.execute("SELECT COUNT(*) FROM torrents WHERE info_hash != ''").fetchone()[0]
+
+    def __drop(self, path: str):
+        key = os.fsencode(path)
+        self.__conn.execute("DELETE FROM torrents WHERE path = ?", (key,))
+        self.__conn.execute("DELETE FROM files WHERE torrent = ?", (key,))
+
+    def update(self, *paths, workers: Optional[int] = None) -> tuple[int, int]:
+        """
+        Index the .torrent files found by `fs.listFile(*paths, ext=".torrent")`.
+        The torrents are keyed by their absolute path and only parsed again if their size or mtime changed.
+        The indexed torrents under the given dirs that no longer exist are removed.
+        An invalid torrent is kept with an empty info-hash so it is not parsed again until it changes.
+
+        workers: Optional[int]: the number of parsing processes, default to `os.cpu_count()`
+
+        return:tuple[int, int]: the number of torrents (re)parsed and removed
+        """
+        found: dict[str, tuple[int, int]] = {}
+        for p in listFile(*paths, ext=".torrent"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            found[os.path.abspath(p)] = (st.st_size, st.st_mtime_ns)
+
+        removed = 0
+        with self.__conn:
+            rows = self.__conn.execute("SELECT path, size, mtime_ns FROM torrents")
+            known = {os.fsdecode(path): (size, mtime_ns) for path, size, mtime_ns in rows}
+            for root in (os.path.abspath(p) for p in paths if Path(p).is_dir()):
+                prefix = os.path.join(root, "")
+                for path in [path for path in known if path.startswith(prefix) and path not in found]:
+                    self.__drop(path)
+                    removed += 1
+        changed = [path for path, key in found.items() if known.get(path) != key]
+
+        if changed:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = pool.map(_parseTorrent, changed, chunksize=max(1, min(64, len(changed) // 64)))
+                with self.__conn:
+                    for path, parsed in zip(changed, results):
+                        self.__drop(path)
+                        key = os.fsencode(path)
+                        info_hash, name, total_size, files = parsed or ("", "", 0, [])
+                        self.__conn.execute(
+                            "INSERT INTO torrents VALUES (?, ?, ?, ?, ?, ?)",
+                            (key, *found[path], info_hash, name, total_size),
+                        )
+                        self.__conn.executemany(
+                            "INSERT INTO files VALUES (?, ?, ?, ?)",
+                            ((key, i, file, length) for i, (file, length) in enumerate(files)),
+                        )
+        return len(changed), removed
+
+    def findBySize(self, length: int) -> list[tuple[Path, str]]:
+        "Return the (torrent path, file path inside the torrent) of each indexed file of exactly `length` bytes."
+        rows = self.__conn.execute("SELECT torrent, path FROM files WHERE length = ? ORDER BY torrent, pos", (length,))
+        return [(Path(os.fsdecode(torrent)), path) for torrent, path in rows]
+
+    def findByHash(self, info_hash: str) -> list[Path]:
+        "Return the paths of the indexed torrents of the given hex info-hash."
+        rows = self.__conn.execute("SELECT path FROM torrents WHERE info_hash = ? ORDER BY path", (info_hash.lower(),))
+        return [Path(os.fsdecode(path)) for path, in rows]
+
+    def get(self, torrent_path: PathObj) -> Optional[dict]:
+        """
+        Return the indexed record of a torrent, None if it is not indexed or invalid.
+
+        return:Optional[dict]: {"info_hash": str, "name": str, "total_size": int, "files": list[tuple[str, int]]}
+        """
+        path = os.fsencode(os.path.abspath(torrent_path))
+        row = self.__conn.execute(
+            "SELECT info_hash, name, total_size FROM torrents WHERE path = ? AND info_hash != ''", (path,)
+        ).fetchone()
+        if not row:
+            return None
+        files = self.__conn.execute("SELECT path, length FROM files WHERE torrent = ? ORDER BY pos", (path,))
+        return {"info_hash": row[0], "name": row[1], "total_size": row[2], "files": files.fetchall()}